@@ -0,0 +1,107 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tyndp_processing as tp
+
+COUNTRIES = ["AT", "CH", "DE", "FR", "IT"]
+CATEGORIES = ["Demand [MW]", "Electrolyser [MW]", "Electrolyser Demand [MW]", "Generation [MW]", None]
+NODES = [
+    "AT00", "DE00RETE", "DE00 EV Passenger Prosumer", "FR00 EV Passenger Street", "ITCN", "ITSIRETE",
+    "CH00 Heat Pump", "ES00", "NL00RETE", None,
+]
+# ============================================================================
+def reference_demand(df, countries):
+    # per-column loop of make_tyndp24 before the vectorized classification,
+    # on the sheet as read by pd.read_excel(..., header=None)
+    categories = df.iloc[10, 2:]
+    nodes_raw = df.iloc[11, 2:]
+    data = (
+            df
+            .iloc[13:, 2:]
+            .apply(pd.to_numeric, errors="coerce")
+            .fillna(0.0)
+            .reset_index(drop=True)
+        )
+    profiles = pd.DataFrame(0.0, index=data.index, columns=countries)
+    totals = pd.DataFrame(0.0, index=[
+        "Electrolysis",
+        "Prosumer Node",
+        "Transmission Node",
+        "Transport Node"
+    ], columns=countries)
+    for col in data.columns:
+        node = nodes_raw[col]
+        cat = categories[col]
+        if not isinstance(node, str) or not isinstance(cat, str):
+            continue
+        country = node[:2]
+        if country not in countries:
+            continue
+        series = data[col]
+        is_demand = "Demand [MW]" in cat
+        is_electrolysis = "Electrolyser" in cat
+        if is_demand:
+            profiles[country] += series
+        if is_electrolysis:
+            totals.loc["Electrolysis", country] += series.sum()
+            profiles[country] += series
+        elif is_demand and node.endswith("RETE"):
+            totals.loc["Prosumer Node", country] += series.sum()
+        elif is_demand and (
+            "EV Passenger Prosumer" in node
+            or "EV Passenger Street" in node
+        ):
+            totals.loc["Transport Node", country] += series.sum()
+        elif is_demand:
+            totals.loc["Transmission Node", country] += series.sum()
+    totals.loc["Total demand"] = totals.sum()
+    totals /= 1000
+    totals = totals.reset_index().rename(columns={"index": "Demand_node"})
+    return totals, profiles
+# ============================================================================
+@pytest.fixture
+def hourly_sheet(tmp_path):
+    # small "Hourly Market Data emarket" sheet with every column class, columns
+    # outside COUNTRIES, missing header cells and blank values
+    rng = np.random.default_rng(0)
+    columns, hours = 60, 50
+    categories = [CATEGORIES[i] for i in rng.integers(0, len(CATEGORIES), columns)]
+    nodes = [NODES[i] for i in rng.integers(0, len(NODES), columns)]
+    values = np.round(rng.random((hours, columns)) * 1e3, 4)
+    values[rng.random((hours, columns)) < 0.05] = np.nan
+    book = Workbook()
+    ws = book.active
+    ws.title = "Hourly Market Data emarket"
+    for r in range(10):
+        ws.append([f"info {r}"])
+    ws.append([None, None] + categories)
+    ws.append([None, None] + nodes)
+    ws.append(["Hour"])
+    for h in range(hours):
+        ws.append([h + 1, 0] + [None if np.isnan(v) else float(v) for v in values[h]])
+    path = os.path.join(tmp_path, "MMStandardOutputFile_DE2035_Plexos_CY1995_v11_SoS.xlsx")
+    book.save(path)
+    return path
+# ============================================================================
+def test_classify_hourly_demand_matches_column_loop(hourly_sheet):
+    df = pd.read_excel(hourly_sheet, sheet_name="Hourly Market Data emarket", header=None)
+    ref_totals, ref_profiles = reference_demand(df, COUNTRIES)
+    values = df.iloc[13:, 2:].apply(pd.to_numeric, errors="coerce").fillna(0.0).to_numpy()
+    totals, profiles = tp.classify_hourly_demand(df.iloc[10, 2:], df.iloc[11, 2:], values, COUNTRIES)
+    pd.testing.assert_frame_equal(totals, ref_totals, check_exact=True)
+    pd.testing.assert_frame_equal(profiles, ref_profiles, check_exact=True)
+# ============================================================================
+@pytest.mark.parametrize("chunk_cols", [4, 256])
+def test_read_hourly_demand_matches_column_loop(hourly_sheet, chunk_cols, monkeypatch):
+    monkeypatch.setattr(tp, "USE_CACHE", False)
+    df = pd.read_excel(hourly_sheet, sheet_name="Hourly Market Data emarket", header=None)
+    ref_totals, ref_profiles = reference_demand(df, COUNTRIES)
+    totals, profiles = tp.read_hourly_demand(hourly_sheet, COUNTRIES, chunk_cols=chunk_cols)
+    pd.testing.assert_frame_equal(totals, ref_totals, check_exact=True)
+    pd.testing.assert_frame_equal(profiles, ref_profiles, check_exact=True)
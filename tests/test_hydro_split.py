@@ -0,0 +1,88 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tyndp_processing as tp
+
+COUNTRIES = ["AT", "CH", "DE"]
+# Hydro Dam/RoR values per (unit, year), countries in COUNTRIES order
+VALUES = {
+    ("GWh", 2035): [[10.0, 30.0, 1.0], [30.0, 10.0, 3.0]],
+    ("MW", 2035): [[4.0, 8.0, 1.0], [4.0, 2.0, 1.0]],
+    ("GWh", 2050): [[20.0, 30.0, 2.0], [20.0, 30.0, 6.0]],
+    ("MW", 2050): [[1.0, 1.0, 3.0], [3.0, 1.0, 1.0]],
+}
+# ============================================================================
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(tp, "USE_CACHE", False)
+# ============================================================================
+def write_share_file(path):
+    # layout of TYNDP2024_HydroShare.xlsx: one block per table, headed by its
+    # sheet name and the countries, blocks separated by empty rows
+    rows = []
+    for (unit, year), values in VALUES.items():
+        rows.append([f"{unit}_DE{year}"] + COUNTRIES)
+        rows += [[tech] + row for tech, row in zip(tp.HYDRO_TECHS, values)]
+        rows += [[None] * (len(COUNTRIES) + 1)] * 2
+    pd.DataFrame(rows).to_excel(path, header=False, index=False)
+# ============================================================================
+def expected_share(unit, year):
+    values = np.array(VALUES[unit, year])
+    return values / values.sum(axis=0)
+# ============================================================================
+def test_split_hydro_tables():
+    table = pd.DataFrame({
+        "Tech_group": ["Solar", "Hydro", "Gas"],
+        "AT": [1.0, 100.0, 2.0],
+        "DE": [3.0, 50.0, 4.0],
+        "NO": [5.0, 80.0, 6.0],
+    })
+    shares = pd.DataFrame({"AT": [0.25, 0.75], "DE": [0.75, 0.25]}, index=pd.Index(tp.HYDRO_TECHS))
+    out = tp.split_hydro_tables({"k": table}, {"k": shares})["k"]
+    assert out["Tech_group"].tolist() == ["Solar", "Hydro Dam", "Hydro RoR", "Gas"]
+    assert out["AT"].tolist() == [1.0, 25.0, 75.0, 2.0]
+    assert out["DE"].tolist() == [3.0, 37.5, 12.5, 4.0]
+    # NO has no share of its own and takes the mean share of AT and DE
+    assert out["NO"].tolist() == [5.0, 40.0, 40.0, 6.0]
+    pd.testing.assert_frame_equal(tp.split_hydro(table, shares), out)
+# ============================================================================
+def test_hydro_share_table_from_share_file(tmp_path):
+    write_share_file(os.path.join(tmp_path, tp.HYDRO_SHARE_FILE))
+    table = tp.hydro_share_table(str(tmp_path), ["CY1995"], [2030, 2035, 2040, 2050, 2060])
+    for unit in tp.HYDRO_UNITS:
+        share = {year: table.loc[(unit, "CY1995", year)].loc[tp.HYDRO_TECHS, COUNTRIES].to_numpy()
+                 for year in (2030, 2035, 2040, 2050, 2060)}
+        np.testing.assert_allclose(share[2035], expected_share(unit, 2035), rtol=1e-12)
+        np.testing.assert_allclose(share[2050], expected_share(unit, 2050), rtol=1e-12)
+        # interpolated between the anchors, held constant outside them
+        np.testing.assert_allclose(share[2040], share[2035] + (share[2050] - share[2035]) / 3, rtol=1e-12)
+        np.testing.assert_array_equal(share[2030], share[2035])
+        np.testing.assert_array_equal(share[2060], share[2050])
+        np.testing.assert_allclose(share[2040].sum(axis=0), 1.0, rtol=1e-12)
+# ============================================================================
+def test_hydro_share_table_prefers_tyndp24_anchors(tmp_path, monkeypatch):
+    # CY2009 has TYNDP 2024 workbooks of 2035 and 2050, CY1995 only the file
+    write_share_file(os.path.join(tmp_path, tp.HYDRO_SHARE_FILE))
+    hydro = {}
+    for year, scale in ((2035, 1.0), (2050, 3.0)):
+        path = os.path.join(tmp_path, f"MMStandardOutputFile_DE{year}_Plexos_CY2009_v11_SoS.xlsb")
+        open(path, "w").close()
+        hydro[path] = pd.concat(
+            {unit: pd.DataFrame([[1.0, 1.0, 1.0], [scale, scale, scale]], index=tp.HYDRO_TECHS, columns=COUNTRIES)
+             for unit in tp.HYDRO_UNITS},
+            names=["unit", "Tech_group"],
+        )
+    monkeypatch.setattr(tp, "tyndp24_hydro", lambda path, all_nodes=False: hydro[path])
+    table = tp.hydro_share_table(str(tmp_path), ["CY1995", "CY2009"], [2035, 2050])
+    assert tp.hydro_share_anchors(str(tmp_path), "CY2009") == [2035, 2050]
+    assert tp.hydro_share_anchors(str(tmp_path), "CY1995") == []
+    np.testing.assert_allclose(table.loc[("GWh", "CY2009", 2035)].loc["Hydro Dam"], 0.5)
+    np.testing.assert_allclose(table.loc[("GWh", "CY2009", 2050)].loc["Hydro Dam"], 0.25)
+    np.testing.assert_allclose(
+        table.loc[("MW", "CY1995", 2050)].loc[tp.HYDRO_TECHS, COUNTRIES].to_numpy(), expected_share("MW", 2050)
+    )
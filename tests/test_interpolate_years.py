@@ -0,0 +1,71 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tyndp_processing as tp
+
+# ============================================================================
+def interpolate_2035(df_2030, df_2040):
+    # former TYNDP 2022 interpolation of the 2035 tables
+    df = df_2030.copy()
+    for col in df.columns[1:]:
+        df[col] = df_2030[col] + 0.5 * (df_2040[col] - df_2030[col])
+    return df
+# ============================================================================
+def table(techs, rng):
+    return pd.DataFrame({
+        "Tech_group": techs,
+        "AT": rng.random(len(techs)) * 1e4,
+        "DE": rng.random(len(techs)) * 1e4,
+    })
+# ============================================================================
+def test_2035_matches_interpolate_2035():
+    rng = np.random.default_rng(0)
+    techs = ["Hydro", "Solar", "Gas", "Nuclear"]
+    anchors = {2030: table(techs, rng), 2040: table(techs, rng), 2050: table(techs, rng)}
+    out = tp.interpolate_years(anchors, [2035])
+    pd.testing.assert_frame_equal(out[2035], interpolate_2035(anchors[2030], anchors[2040]), check_exact=True)
+# ============================================================================
+def test_anchor_years_are_returned_unchanged():
+    rng = np.random.default_rng(1)
+    anchors = {2030: table(["Solar", "Gas"], rng), 2040: table(["Gas", "Wind"], rng)}
+    out = tp.interpolate_years(anchors, [2030, 2040])
+    for year in anchors:
+        pd.testing.assert_frame_equal(out[year], anchors[year], check_exact=True)
+        assert out[year] is not anchors[year]
+# ============================================================================
+def test_rows_are_aligned_by_label():
+    # a row missing from one anchor counts as 0 there and is kept
+    a = pd.DataFrame({"Tech_group": ["Gas", "Solar"], "DE": [10.0, 20.0]})
+    b = pd.DataFrame({"Tech_group": ["Wind", "Solar"], "DE": [40.0, 60.0]})
+    out = tp.interpolate_years({2030: a, 2040: b}, [2035])[2035]
+    assert out["Tech_group"].tolist() == ["Gas", "Solar", "Wind"]
+    assert out["DE"].tolist() == [5.0, 40.0, 20.0]
+# ============================================================================
+def test_rows_absent_from_both_neighbours_are_dropped():
+    # presence is tracked per anchor: a row only in 2050 is not part of 2035
+    a = pd.DataFrame({"Tech_group": ["Gas"], "DE": [10.0]})
+    b = pd.DataFrame({"Tech_group": ["Gas"], "DE": [30.0]})
+    c = pd.DataFrame({"Tech_group": ["Gas", "Hydrogen"], "DE": [50.0, 7.0]})
+    out = tp.interpolate_years({2030: a, 2040: b, 2050: c}, [2035, 2045])
+    assert out[2035]["Tech_group"].tolist() == ["Gas"]
+    assert out[2045]["Tech_group"].tolist() == ["Gas", "Hydrogen"]
+    assert out[2045]["DE"].tolist() == [40.0, 3.5]
+# ============================================================================
+def test_years_outside_the_anchors():
+    a = pd.DataFrame({"Tech_group": ["Gas"], "DE": [10.0]})
+    b = pd.DataFrame({"Tech_group": ["Gas"], "DE": [30.0]})
+    with pytest.raises(ValueError):
+        tp.interpolate_years({2030: a, 2040: b}, [2025])
+    out = tp.interpolate_years({2030: a, 2040: b}, [2025, 2045], clamp=True)
+    assert out[2025]["DE"].tolist() == [10.0]
+    assert out[2045]["DE"].tolist() == [30.0]
+# ============================================================================
+def test_anchor_years_for():
+    assert tp.anchor_years_for([2035, 2050]) == [2030, 2040, 2050]
+    assert tp.anchor_years_for([2040]) == [2040]
+    assert tp.anchor_years_for([2045]) == [2040, 2050]
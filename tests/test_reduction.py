@@ -0,0 +1,67 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tyndp_processing as tp
+
+# ============================================================================
+@pytest.fixture
+def profile():
+    # 60 days of hourly demand with a daily and a weekly pattern, a country
+    # without energy and one without data
+    rng = np.random.default_rng(0)
+    hours = np.arange(60 * 24)
+    base = 1 + 0.5 * np.sin(2 * np.pi * hours / 24) + 0.3 * (hours // 24 % 7 >= 5)
+    return pd.DataFrame({
+        "DE": 1000 * base + rng.random(len(hours)) * 50,
+        "FR": 800 * base[::-1] + rng.random(len(hours)) * 50,
+        "NO": 0.0,
+        "XX": np.nan,
+    })
+# ============================================================================
+def test_aggregate_profiles_keeps_energy(profile):
+    out = tp.aggregate_profiles(profile[["DE", "FR"]], 24)
+    assert out.index.tolist() == list(range(0, 60 * 24, 24))
+    np.testing.assert_allclose(out.to_numpy(), profile[["DE", "FR"]].to_numpy().reshape(60, 24, 2).sum(axis=1))
+    out = tp.aggregate_profiles(profile[["DE"]], 168)
+    assert out.index[-1] == 8 * 168
+    np.testing.assert_allclose(out["DE"].sum(), profile["DE"].sum())
+# ============================================================================
+@pytest.mark.parametrize("method", ["kmedoids", "kmeans"])
+def test_cluster_days(profile, method):
+    X = profile[["DE", "FR"]].to_numpy().reshape(60, 24, 2).transpose(0, 2, 1).reshape(60, -1)
+    labels, rep = tp.cluster_days(X, 5, method)
+    assert labels.shape == (60,) and rep.shape == (5,)
+    assert set(labels) <= set(range(5))
+    # every representative day is a member of its own cluster
+    assert all(labels[day] == j for j, day in enumerate(rep) if (labels == j).any())
+    again = tp.cluster_days(X, 5, method)
+    np.testing.assert_array_equal(labels, again[0])
+# ============================================================================
+def test_cluster_days_unknown_method(profile):
+    with pytest.raises(ValueError):
+        tp.cluster_days(np.zeros((4, 3)), 2, "ward")
+# ============================================================================
+@pytest.mark.parametrize("method", ["kmedoids", "kmeans"])
+def test_representative_days_keep_energy(profile, method):
+    out = tp.representative_days(profile, 6, method)
+    days = out.groupby("day", sort=False)
+    assert len(days) <= 6 and (days.size() == 24).all()
+    assert out["hour"].tolist() == list(range(24)) * len(days)
+    assert out.drop_duplicates("day")["weight"].sum() == 60
+    for country in ("DE", "FR"):
+        np.testing.assert_allclose((out["weight"] * out[country]).sum(), profile[country].sum(), rtol=1e-12)
+    assert (out["NO"] == 0).all()
+    assert out["XX"].isna().all()
+# ============================================================================
+def test_representative_days_are_days_of_the_profile(profile):
+    # k-medoids picks actual days, rescaled by one factor per country
+    out = tp.representative_days(profile, 4, "kmedoids")
+    for day, rows in out.groupby("day"):
+        actual = profile[["DE", "FR"]].iloc[day * 24:(day + 1) * 24].to_numpy()
+        ratio = rows[["DE", "FR"]].to_numpy() / actual
+        np.testing.assert_allclose(ratio, ratio[:1].repeat(24, axis=0), rtol=1e-12)
@@ -0,0 +1,300 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+import tyndp_processing as tp
+
+try:
+    import resource
+except ImportError:     # not available on Windows
+    resource = None
+
+# ============================================================================
+# Synthetic inputs shaped like the ENTSO-E downloads. The .xlsb files are
+# written as .xlsx, which the pipeline picks up through tp.input_path().
+# ============================================================================
+ZONES = ['AT00', 'AT00RETE', 'AT00 SRES', 'CH00', 'CH00 SRES', 'DE00', 'DE00RETE', 'DE00 SRES', 'FR00', 'FR00RETE', 'FR00 SRES',
+         'ITCA', 'ITCN', 'ITCNRETE', 'ITCS', 'ITN1', 'ITS1', 'ITSA', 'ITSI', 'ITSI SRES', 'BE00', 'NL00', 'PL00']
+OFFSHORE_ZONES = ['DEOH001 DRES', 'DEOH001OHEL', 'DEOH002 DRES', 'FROH001 DRES', 'FROH003OHEL', 'NLOH001 DRES']
+PLEXOS_TECHS = ["Solar PV", "Solar Thermal", "Wind Onshore", "Wind Offshore", "Hydro - Reservoir", "Hydro - Run-of-River",
+                "Hydro - Pondage", "Gas CCGT new", "Gas OCGT old", "Hydrogen CCGT", "Lignite old 1", "Hard coal new",
+                "Light oil", "Nuclear", "Others renewable", "Others non-renewable", "Gas Biofuel", "Battery Storage"]
+PLEXOS_CATEGORIES = ["Annual generation [GWh]", "Installed Capacities [MW]", "CO2 Emissions [kt]"]
+HOURLY_CATEGORIES = ["Demand [MW]", "Electrolyser [MW]", "Generation [MW]", "Dump Energy [MW]"]
+HOURLY_SUFFIXES = ["", "RETE", " EV Passenger Prosumer", " EV Passenger Street", " Heat Pump", " SRES"]
+HOURLY_PREFIXES = ["AT00", "CH00", "DE00", "FR00", "ITCN", "ITSI", "ES00", "BE00", "NL00", "PL00"]
+PROFILE_SHEETS = ["AT00", "CH00", "DE00", "DEkf", "FR00", "FR15", "IT00", "ITCN", "ITSI", "ES00", "NL00"]
+CLIMATE_YEARS = list(range(1982, 2017))
+TYNDP22_NODES = ["AT00", "CH00", "DE00", "FR00", "IT00", "BE00", "NL00", "PL00", "ES00", "DKW1"]
+TYNDP22_FUELS = ["Hydro", "Solar", "Wind Onshore", "Wind Offshore", "Other RES", "Biofuels", "Nuclear", "Gas",
+                 "Coal & Lignite", "Oil", "Other Non RES"]
+TYNDP22_FLEX = ["Battery", "DSR", "Gas", "Hydro Pump Storage"]
+TYNDP22_DEMAND = ["Electrolysis Config 1", "Electrolysis Config 2", "Prosumer Node", "Transmission Node", "Transport Node"]
+TYNDP22_SCENARIOS = ["Global Ambition", "Distributed Energy", "National Trends"]
+# ============================================================================
+def write_plexos(path, rng, hours, columns):
+    book = xlsxwriter.Workbook(path, {"constant_memory": True})
+    ws = book.add_worksheet("Yearly Outputs")
+    ws.write_row(0, 0, ["MMStandardOutputFile"])
+    for r in range(1, 5):
+        ws.write_row(r, 0, [f"info {r}", r])
+    ws.write_row(5, 2, ZONES + ["Total"])
+    r = 6
+    for category in PLEXOS_CATEGORIES:
+        ws.write(r, 0, category)
+        r += 1
+        for tech in PLEXOS_TECHS:
+            ws.write(r, 1, tech)
+            for j, v in enumerate(np.round(rng.random(len(ZONES)) * 1e4, 3)):
+                if rng.random() > 0.1:      # blank cells as in the downloads
+                    ws.write_number(r, 2 + j, v)
+            r += 1
+        r += 1
+    ws = book.add_worksheet("Hourly Market Data emarket")
+    for r in range(10):
+        ws.write(r, 0, f"info {r}")
+    ws.write_row(10, 2, list(rng.choice(HOURLY_CATEGORIES, columns)))
+    ws.write_row(11, 2, [p + s for p, s in zip(rng.choice(HOURLY_PREFIXES, columns), rng.choice(HOURLY_SUFFIXES, columns))])
+    ws.write(12, 0, "Hour")
+    values = np.round(rng.random((hours, columns)) * 1e3, 4)
+    for h in range(hours):
+        ws.write_row(13 + h, 0, [h + 1, 0])
+        ws.write_row(13 + h, 2, values[h])
+    book.close()
+# ============================================================================
+def write_offshore(path, rng):
+    book = xlsxwriter.Workbook(path)
+    ws = book.add_worksheet("Yearly Outputs")
+    ws.write_row(0, 0, ["MMStandardOutputFile"])
+    for r in range(1, 5):
+        ws.write_row(r, 0, [f"info {r}", r])
+    ws.write_row(5, 2, OFFSHORE_ZONES)
+    ws.write(6, 0, "Annual generation [GWh]")
+    ws.write_row(6, 2, np.round(rng.random(len(OFFSHORE_ZONES)) * 1e3, 3))
+    ws.write(7, 1, "Wind Offshore")
+    ws.write_row(7, 2, np.round(rng.random(len(OFFSHORE_ZONES)) * 1e3, 3))
+    book.close()
+# ============================================================================
+def write_demand_timeseries(path, rng, hours):
+    book = xlsxwriter.Workbook(path, {"constant_memory": True})
+    for sheet in PROFILE_SHEETS:
+        ws = book.add_worksheet(sheet)
+        ws.write_row(0, 0, ["Demand time series"])
+        ws.write_row(2, 0, ["Node", sheet])
+        ws.write_row(4, 0, ["Unit", "MW"])
+        ws.write_row(6, 0, ["Date", "Hour"] + CLIMATE_YEARS)
+        values = np.round(rng.random((hours, len(CLIMATE_YEARS))) * 5e3, 5)
+        for h in range(hours):
+            ws.write_row(7 + h, 0, [f"{h // 24 + 1:03d}", h % 24 + 1])
+            ws.write_row(7 + h, 2, values[h])
+    book.close()
+# ============================================================================
+def long_table(rng, labels, parameters, label_column, drop=0.1):
+    # long-format sheet of the 220310 workbook, some rows missing and some
+    # (node, label) pairs spread over several rows
+    records = []
+    for scenario in TYNDP22_SCENARIOS:
+        for cy in ["CY 1995", "CY 2008", "CY 2009"]:
+            for year in [2025, 2030, 2040, 2050]:
+                for parameter in parameters:
+                    for node in TYNDP22_NODES:
+                        for label in labels:
+                            if rng.random() < drop:
+                                continue
+                            for _ in range(int(rng.integers(1, 3))):
+                                records.append((scenario, cy, year, parameter, node, label, round(rng.random() * 1e4, 3)))
+    return pd.DataFrame(records, columns=["Scenario", "Climate Year", "Year", "Parameter", "Node", label_column, "Value"])
+# ============================================================================
+def write_tyndp22(path, rng):
+    sheets = {
+        "Capacity & Dispatch": long_table(rng, TYNDP22_FUELS, ["Dispatch (GWh)", "Capacity (MW)", "Emissions (kt)"], "Fuel"),
+        "Flexibility": long_table(rng, TYNDP22_FLEX, ["Dispatch (GWh)", "Capacity (MW)"], "Fuel"),
+        "Demand": long_table(rng, TYNDP22_DEMAND, ["Native Demand (GWh)", "Peak (MW)"], "Type_node", drop=0),
+    }
+    with pd.ExcelWriter(path, engine="xlsxwriter") as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+# ============================================================================
+def make_inputs(dir_in, CY, hours=8760, columns=300, seed=0):
+    # writes all inputs of one climate year unless they exist at this scale
+    scale = {"CY": CY, "hours": hours, "columns": columns, "seed": seed}
+    stamp = os.path.join(dir_in, "benchmark_inputs.json")
+    if os.path.exists(stamp):
+        with open(stamp) as f:
+            if json.load(f) == scale:
+                return
+    os.makedirs(dir_in, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    for year in ["DE2035", "DE2050"]:
+        main, offshore = tp.tyndp24_inputs(dir_in, CY, year)
+        write_plexos(os.path.splitext(main)[0] + ".xlsx", rng, hours, columns)
+        write_offshore(os.path.splitext(offshore)[0] + ".xlsx", rng)
+    tyndp22, *profiles = tp.tyndp22_inputs(dir_in, tp.TYNDP22_YEARS)
+    write_tyndp22(tyndp22, rng)
+    for path in profiles:
+        write_demand_timeseries(os.path.splitext(path)[0] + ".xlsx", rng, hours)
+    tp._write_json_atomic(stamp, scale)
+
+# ============================================================================
+# Stages. Each one prepares its arguments outside the timed region and
+# returns the call to be timed.
+# ============================================================================
+def stage_make_tyndp24(ctx):
+    return lambda: tp.make_tyndp24(ctx["dir_in"], ctx["dir_out"], ctx["CY"], write=False)
+
+def stage_make_tyndp22(ctx):
+    return lambda: tp.make_tyndp22(ctx["dir_in"], ctx["dir_out"], ctx["CY"], write=False, workers=ctx["workers"])
+
+def stage_read_profiles(ctx):
+    fname = os.path.basename(tp.tyndp22_inputs(ctx["dir_in"], [2030])[1])
+    nodes = ["AT00", "CH00", "DE00", "FR00", "IT00"]
+    return lambda: tp.read_profiles(ctx["dir_in"], fname, nodes, ctx["CY"], workers=ctx["workers"])
+
+def _tyndp22_frame(ctx):
+    df = pd.read_excel(tp.tyndp22_inputs(ctx["dir_in"], [])[0], sheet_name="Capacity & Dispatch")
+    return df[(df["Scenario"] == "Global Ambition") & (df["Climate Year"] == ctx["CY"][:2] + " " + ctx["CY"][2:])]
+
+def stage_build_generator_table(ctx):
+    df = _tyndp22_frame(ctx)
+    nodes = TYNDP22_NODES
+    node_map = {n: n[:2] for n in nodes}
+    fuel_map = {f: f for f in TYNDP22_FUELS}
+    return lambda: [
+        tp.build_generator_table(df, year, parameter, nodes, node_map, fuel_map, TYNDP22_FUELS)
+        for year in tp.TYNDP22_YEARS
+        for parameter in ["Dispatch (GWh)", "Capacity (MW)"]
+    ]
+
+def stage_split_hydro(ctx):
+    df = _tyndp22_frame(ctx)
+    nodes = TYNDP22_NODES
+    node_map = {n: n[:2] for n in nodes}
+    fuel_map = {f: f for f in TYNDP22_FUELS}
+    tables = [
+        tp.build_generator_table(df, year, "Capacity (MW)", nodes, node_map, fuel_map, TYNDP22_FUELS)
+        for year in tp.TYNDP22_YEARS
+    ]
+    dam = np.random.default_rng(0).random(len(nodes))
+    share = pd.DataFrame([dam, 1 - dam], index=["Hydro Dam", "Hydro RoR"], columns=[node_map[n] for n in nodes])
+    return lambda: [tp.split_hydro(table, share) for table in tables for _ in range(100)]
+
+def stage_safe_excel_writer(ctx):
+    df = pd.DataFrame(np.random.default_rng(0).random((ctx["hours"], 5)) * 1e4, columns=["AT", "CH", "DE", "FR", "IT"])
+    path = os.path.join(ctx["dir_out"], "benchmark_writer.xlsx")
+    def run():
+        if os.path.exists(path):
+            os.remove(path)
+        tp.safe_excel_writer(path, "MWh_benchmark", df, idx=False)
+    return run
+
+STAGES = {
+    "make_tyndp24": stage_make_tyndp24,
+    "make_tyndp22": stage_make_tyndp22,
+    "read_profiles": stage_read_profiles,
+    "build_generator_table": stage_build_generator_table,
+    "split_hydro": stage_split_hydro,
+    "safe_excel_writer": stage_safe_excel_writer,
+}
+# ============================================================================
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024**2 if sys.platform == "darwin" else rss / 1024
+# ============================================================================
+def measure(name, ctx, repeat):
+    # runs in a fresh process so that the peak RSS belongs to this stage only
+    tp.USE_CACHE = ctx["cache"]
+    # reads ahead run inline, so that the parsing is measured in this process
+    tp.PREFETCH = 1
+    os.makedirs(ctx["dir_out"], exist_ok=True)
+    run = STAGES[name](ctx)
+    run()       # warm-up, also fills the cache when it is enabled
+    walls = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        walls.append(time.perf_counter() - start)
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "wall_s": min(walls),
+        "wall_all_s": walls,
+        "tracemalloc_peak_mb": peak / 1024**2,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+# ============================================================================
+def run_benchmark(work_dir, stages, hours=8760, columns=300, CY="CY1995", repeat=3, workers=1, cache=False):
+    dir_in = os.path.join(work_dir, "TYNDP_in")
+    start = time.perf_counter()
+    make_inputs(dir_in, CY, hours=hours, columns=columns)
+    print(f"Inputs ready : {time.perf_counter() - start:.1f} second")
+    ctx = {
+        "dir_in": dir_in,
+        "dir_out": os.path.join(work_dir, "TYNDP_out"),
+        "CY": CY,
+        "hours": hours,
+        "workers": workers,
+        "cache": cache,
+    }
+    results = {}
+    for name in stages:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            results[name] = pool.submit(measure, name, ctx, repeat).result()
+        print(f"{name:<24} {results[name]['wall_s']:8.3f} s  {results[name]['tracemalloc_peak_mb']:8.1f} MB")
+    return {
+        "code": tp.code_fingerprint()[:12],
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "scale": {"hours": hours, "columns": columns, "CY": CY, "repeat": repeat, "workers": workers, "cache": cache},
+        "stages": results,
+    }
+# ============================================================================
+def save_report(path, version, result):
+    # the report keeps one entry per version so that runs can be compared
+    report = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            report = json.load(f)
+    report[version] = result
+    tp._write_json_atomic(path, report)
+# ============================================================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the TYNDP processing stages on synthetic inputs.")
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "tyndp_benchmark"),
+                        help="folder for the synthetic inputs and outputs; inputs are reused at equal scale")
+    parser.add_argument("--hours", type=int, default=8760, help="rows of the hourly sheets")
+    parser.add_argument("--columns", type=int, default=300, help="columns of the hourly market data sheet")
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage, the fastest is reported")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes of the profile reader")
+    parser.add_argument("--cache", action="store_true", help="time with the parsed-input cache enabled")
+    parser.add_argument("--version", default=None, help="report key, defaults to the hash of tyndp_processing.py")
+    parser.add_argument("--report", default="tyndp_benchmark.json", help="JSON report, updated in place")
+    return parser.parse_args(argv)
+# ============================================================================
+def main(argv=None):
+    args = parse_args(argv)
+    result = run_benchmark(
+        os.path.abspath(args.work_dir), args.stages, hours=args.hours, columns=args.columns,
+        repeat=args.repeat, workers=args.workers, cache=args.cache,
+    )
+    save_report(args.report, args.version or result["code"], result)
+    print(f"Report : {os.path.abspath(args.report)}")
+# ============================================================================
+# e.g. python tyndp_benchmark.py --hours 8760 --columns 1000 --version v1.2
+if __name__ == "__main__" : main()
+# ============================================================================
@@ -4,77 +4,466 @@
 # ============================================================================
 import time
 import os
+import re
+import json
+import pickle
+import hashlib
+import argparse
+import itertools
+import collections
+import contextlib
+import functools
+import importlib.util
+import tracemalloc
+import warnings
+import numpy as np
 import pandas as pd
-from openpyxl import load_workbook
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from openpyxl import load_workbook, Workbook
+try:
+    import resource
+except ImportError:     # not available on Windows
+    resource = None
+# ============================================================================
+# Parsed input sheets are cached next to the inputs (TYNDP_in/.tyndp_cache)
+USE_CACHE = True
+CACHE_DIRNAME = ".tyndp_cache"
+CACHE_MAX_BYTES = 2 * 1024**3
+# ============================================================================
+def file_hash(path, chunk_size=1 << 20):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+# ============================================================================
+def _write_json_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp, path)
+# ============================================================================
+def file_fingerprint(path):
+    # content hashes are remembered per (path, size, mtime) in index.json,
+    # so an unchanged input is only hashed once
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    cache_dir = os.path.join(os.path.dirname(path), CACHE_DIRNAME)
+    index_path = os.path.join(cache_dir, "index.json")
+    index = {}
+    if os.path.exists(index_path):
+        try:
+            with open(index_path) as f:
+                index = json.load(f)
+        except ValueError:
+            index = {}
+    entry = index.get(path)
+    if entry is not None and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+        return entry | {"path": path}
+    entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": file_hash(path)}
+    if USE_CACHE:
+        os.makedirs(cache_dir, exist_ok=True)
+        index[path] = entry
+        _write_json_atomic(index_path, index)
+    return entry | {"path": path}
+# ============================================================================
+def _cache_evict(cache_dir, max_bytes):
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith((".parquet", ".pkl")):
+            st = os.stat(os.path.join(cache_dir, name))
+            entries.append((st.st_mtime_ns, st.st_size, name))
+    total = sum(e[1] for e in entries)
+    for _, size, name in sorted(entries):    # least recently used first
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(cache_dir, name))
+        except FileNotFoundError:
+            pass
+        total -= size
+# ============================================================================
+def _cache_key(path, tag):
+    fp = file_fingerprint(path)
+    key = hashlib.blake2b(
+        repr((fp["path"], fp["size"], fp["mtime_ns"], fp["hash"], tag)).encode(),
+        digest_size=16,
+    ).hexdigest()
+    return os.path.join(os.path.dirname(fp["path"]), CACHE_DIRNAME), key
+# ============================================================================
+def cache_get(path, tag):
+    return _cache_load(*_cache_key(path, tag))
+# ============================================================================
+def _cache_load(cache_dir, key):
+    for ext in (".parquet", ".pkl"):
+        cache_path = os.path.join(cache_dir, key + ext)
+        if os.path.exists(cache_path):
+            os.utime(cache_path)
+            if ext == ".parquet":
+                return pd.read_parquet(cache_path)
+            with open(cache_path, "rb") as f:
+                return pickle.load(f)
+    return None
+# ============================================================================
+def cache_put(path, tag, df):
+    _cache_store(*_cache_key(path, tag), df)
+# ============================================================================
+def _cache_store(cache_dir, key, df):
+    # Parquet where Arrow can represent the frame; mixed object columns and
+    # non-string column labels are stored as pickle instead
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = os.path.join(cache_dir, f"{key}.{os.getpid()}.tmp")
+    try:
+        labels = df.columns.to_flat_index()
+        if not all(isinstance(c, str) or (isinstance(c, tuple) and all(isinstance(x, str) for x in c))
+                   for c in labels):
+            raise TypeError("Parquet needs string column labels")
+        df.to_parquet(tmp)
+        os.replace(tmp, os.path.join(cache_dir, key + ".parquet"))
+    except (ImportError, ValueError, TypeError):
+        with open(tmp, "wb") as f:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, os.path.join(cache_dir, key + ".pkl"))
+    _cache_evict(cache_dir, CACHE_MAX_BYTES)
+# ============================================================================
+def cached_frame(path, tag, loader):
+    # Returns loader() and caches the DataFrame, keyed by the input file
+    # (path, size, mtime, content hash) and a tag describing the read
+    if not USE_CACHE:
+        return loader()
+    df = cache_get(path, tag)
+    if df is None:
+        df = loader()
+        cache_put(path, tag, df)
+    return df
+# ============================================================================
+def cached_result(cache_dir, values, tag, loader):
+    # as cached_frame for results derived from an array rather than an input
+    # file: keyed by the array content and the tag, stored in cache_dir
+    if not USE_CACHE or cache_dir is None:
+        return loader()
+    values = np.ascontiguousarray(values)
+    h = hashlib.blake2b(values.tobytes(), digest_size=16)
+    h.update(repr((values.shape, values.dtype.str, tag)).encode())
+    key = h.hexdigest()
+    df = _cache_load(cache_dir, key)
+    if df is None:
+        df = loader()
+        _cache_store(cache_dir, key, df)
+    return df
+# ============================================================================
+def read_excel_cached(path, sheet_name, **kwargs):
+    tag = ("read_excel", sheet_name, sorted(kwargs.items()))
+    return cached_frame(path, tag, lambda: pd.read_excel(path, sheet_name=sheet_name, **kwargs))
+# ============================================================================
+# Run report: while RUN_STATS is a list, each stage(...) block appends one
+# record to it; otherwise stage() costs one generator call
+RUN_STATS = None
+REPORT_NAME = "tyndp_run_report.json"
+# ============================================================================
+def enable_stats(memory=False):
+    # memory=True also traces Python allocations (slower)
+    global RUN_STATS
+    RUN_STATS = []
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+# ============================================================================
+def collect_stats():
+    # returns the records so far and switches the instrumentation off
+    global RUN_STATS
+    records, RUN_STATS = RUN_STATS or [], None
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    return records
+# ============================================================================
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024**2 if os.uname().sysname == "Darwin" else rss / 1024
+# ============================================================================
+@contextlib.contextmanager
+def stage(step, vintage=None, CY=None, year=None, name=None):
+    # step: "read", "transform" or "write". The block may add counts (rows,
+    # cols, bytes) to the yielded dict. Stages are not nested, but writes of
+    # the background writer overlap other stages, so their peaks are shared.
+    info = {}
+    if RUN_STATS is None:
+        yield info
+        return
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    wall, cpu = time.perf_counter(), time.process_time()
+    yield info
+    record = {
+        "vintage": vintage,
+        "CY": CY,
+        "year": year,
+        "step": step,
+        "name": name,
+        "wall_s": time.perf_counter() - wall,
+        "cpu_s": time.process_time() - cpu,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    if tracemalloc.is_tracing():
+        record["tracemalloc_peak_mb"] = tracemalloc.get_traced_memory()[1] / 1024**2
+    record.update(info)
+    RUN_STATS.append(record)
+# ============================================================================
+def count_frames(info, *frames):
+    info["rows"] = info.get("rows", 0) + sum(df.shape[0] for df in frames)
+    info["cols"] = info.get("cols", 0) + sum(df.shape[1] for df in frames)
+# ============================================================================
+# Label mappings (zones, nodes, fuels, technology rules) live in a data file
+MAPPINGS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tyndp_mappings.json")
+# ============================================================================
+@functools.lru_cache(maxsize=None)
+def load_mappings(path=MAPPINGS_FILE):
+    # parsed once per process; treat the returned dict as read-only
+    with open(path, encoding="utf-8") as f:
+        mappings = json.load(f)
+    mappings["tech_rules"] = tuple(
+        (
+            rule["group"],
+            rule["match"] == "startswith",
+            rule.get("ignore_case", False),
+            tuple(p.lower() if rule.get("ignore_case", False) else p for p in rule["patterns"]),
+        )
+        for rule in mappings["tech_rules"]
+    )
+    return mappings
+# ============================================================================
+@functools.lru_cache(maxsize=None)
+def _match_tech(t):
+    # (technology group, matched) of a stripped label; the first matching rule wins
+    for group, startswith, ignore_case, patterns in load_mappings()["tech_rules"]:
+        label = t.lower() if ignore_case else t
+        if label.startswith(patterns) if startswith else any(p in label for p in patterns):
+            return group, True
+    return t, False
 # ============================================================================
 def map_tech(tech):
-    t = tech.strip()
-    if t.lower().startswith("solar"):
-        return "Solar"
-    if "Reservoir" in t or "Pondage" in t:
-        return "Hydro Dam"
-    if "Run-of-River" in t:
-        return "Hydro RoR"
-    if "biofuel" in t.lower():
-        return "Biofuels"
-    if t.lower().startswith("gas") and "biofuel" not in t.lower() or "Hydrogen CCGT" in t:
-        return "Gas"
-    if ("lignite" in t.lower() or "coal" in t.lower()) and "biofuel" not in t.lower():
-        return "Coal and lignite"
-    if "oil" in t.lower():
-        return "Oil"
-    if "nuclear" in t.lower():
-        return "Nuclear"
-    if "Others renewable" in t:
-        return "Others renewable"
-    if "Others non-renewable" in t:
-        return "Others non-renewable"
-    return t
+    return _match_tech(tech.strip())[0]
+# ============================================================================
+_REPORTED = set()
+def report_unmapped(kind, labels):
+    # prints labels without a mapping once per run instead of once per row
+    labels = sorted(set(labels) - _REPORTED)
+    if labels:
+        _REPORTED.update(labels)
+        print(f"Unmapped {kind} (kept as is) : {', '.join(labels)}")
+# ============================================================================
+def map_techs(labels, known=()):
+    # map_tech over a whole column: every distinct label is matched once and
+    # the labels no rule covers (and that are not `known` groups already)
+    # are reported together
+    labels = pd.Series(labels, dtype=object)
+    codes, uniques = pd.factorize(labels)
+    matched = [_match_tech(str(u).strip()) for u in uniques]
+    report_unmapped("technologies", [group for group, ok in matched if not ok and group not in known])
+    groups = np.array([group for group, _ in matched] + [np.nan], dtype=object)
+    return pd.Series(groups[codes], index=labels.index)
+# ============================================================================
+def zone_columns(columns, zone2country):
+    # {country: zone columns present in `columns`, in registry order}; zones are
+    # looked up through the positions of the column labels in the registry
+    codes = pd.Index(sum(zone2country.values(), [])).get_indexer(columns)
+    present = set(codes[codes >= 0])
+    groups, offset = {}, 0
+    for country, zones in zone2country.items():
+        groups[country] = [z for i, z in enumerate(zones, offset) if i in present]
+        offset += len(zones)
+    return groups
+# ============================================================================
+NODE_PATTERN = re.compile(r"[A-Z]{2}[A-Z0-9]{2}")
+def node_country(label):
+    # country of a node or zone header ("DE00RETE", "ITCN SRES", "DEOH001 DRES"
+    # -> "DE"); None for other labels ("Total", "Category", ...)
+    if isinstance(label, str) and NODE_PATTERN.match(label):
+        return label[:2]
+    return None
+# ============================================================================
+def node_columns(columns):
+    # {country: node columns} of all node headers in `columns`, countries sorted
+    groups = {}
+    for column in columns:
+        country = node_country(column)
+        if country is not None:
+            groups.setdefault(country, []).append(column)
+    return dict(sorted(groups.items()))
+# ============================================================================
+def nodes_to_countries(df):
+    # long-format TYNDP 2022 table with every Node replaced by its country code;
+    # rows of other labels are dropped. Each distinct node is resolved once.
+    codes, uniques = pd.factorize(df["Node"])
+    country = np.array([node_country(u) for u in uniques] + [None], dtype=object)[codes]
+    return df.assign(Node=country)[pd.notna(country)]
+# ============================================================================
+def group_sums(df, groups):
+    # {name: columns} -> one column per name (NaN counts as 0). The k-th
+    # column of every block is added in step k, so each sum runs left to
+    # right in column order, as the per-country sums of earlier versions did,
+    # and gives the same floating point result.
+    cols = [c for members in groups.values() for c in members]
+    sizes = np.array([len(members) for members in groups.values()], dtype=int)
+    out = np.zeros((len(df), len(groups)))
+    if cols:
+        values = np.nan_to_num(df[cols].to_numpy(dtype=np.float64))
+        starts = np.cumsum(sizes) - sizes
+        for k in range(sizes.max()):
+            filled = sizes > k
+            out[:, filled] += values[:, starts[filled] + k]
+    return pd.DataFrame(out, index=df.index, columns=list(groups))
+# ============================================================================
+def ordered_group_sum(df, key, columns):
+    # df.groupby(key)[columns].sum() with the rows of each group added one by
+    # one in row order (NaN counts as 0), as the object-dtype sums of earlier
+    # versions did, instead of the compensated float sum of pandas
+    codes, keys = pd.factorize(df[key], sort=True)
+    out = np.zeros((len(keys), len(columns)))
+    rows = codes >= 0
+    np.add.at(out, codes[rows], np.nan_to_num(df[columns].to_numpy(dtype=np.float64)[rows]))
+    return pd.DataFrame(out, index=pd.Index(keys, name=key), columns=df[columns].columns)
+# ============================================================================
+def add_sheet(outputs, workbook, sheet_name, df, idx):
+    # outputs: {workbook file name: {sheet name: (df, idx)}}, written by write_outputs
+    outputs.setdefault(workbook, {})[sheet_name] = (df, idx)
+# ============================================================================
+def write_workbook(path, sheets):
+    # one load/save per workbook; existing sheets are kept, equal names replaced in place
+    with stage("write", CY=os.path.basename(os.path.dirname(path)), name=os.path.basename(path)) as info:
+        if os.path.exists(path):
+            with pd.ExcelWriter(
+                path,
+                engine="openpyxl",
+                mode="a",
+                if_sheet_exists="replace"
+            ) as writer:
+                for sheet_name, (df, idx) in sheets.items():
+                    df.to_excel(writer, sheet_name=sheet_name, index=idx)
+        else:
+            engine = "xlsxwriter" if importlib.util.find_spec("xlsxwriter") else "openpyxl"
+            with pd.ExcelWriter(
+                path,
+                engine=engine,
+                mode="w"
+            ) as writer:
+                for sheet_name, (df, idx) in sheets.items():
+                    df.to_excel(writer, sheet_name=sheet_name, index=idx)
+        info["sheets"] = len(sheets)
+        info["bytes"] = os.path.getsize(path)
+# ============================================================================
+def write_outputs(dir_out, outputs):
+    for workbook, sheets in outputs.items():
+        if sheets:
+            write_workbook(os.path.abspath(os.path.join(dir_out, workbook)), sheets)
 # ============================================================================
 def safe_excel_writer(path, sheet_name, df, idx):
-    if os.path.exists(path):
-        with pd.ExcelWriter(
-            path,
-            engine="openpyxl",
-            mode="a",
-            if_sheet_exists="replace"
-        ) as writer:
-            df.to_excel(writer, sheet_name=sheet_name, index=idx)
+    write_workbook(path, {sheet_name: (df, idx)})
+# ============================================================================
+def interpolate_years(tables, years, clamp=False):
+    # tables: {anchor year: DataFrame} of equal layout (leading non-numeric label
+    # columns are aligned on and kept). Returns {year: DataFrame} for all `years`
+    # at once: A[lo] + w * (A[hi] - A[lo]) broadcast over years x rows x columns.
+    # Years outside the anchors raise, or take the nearest anchor with clamp.
+    anchors = np.array(sorted(tables))
+    first = tables[anchors[0]]
+    label_cols = []
+    for col in first.columns:
+        if pd.api.types.is_numeric_dtype(first[col]):
+            break
+        label_cols.append(col)
+    value_cols = [c for c in first.columns if c not in label_cols]
+    frames = [tables[a] for a in anchors]
+    if label_cols:
+        labels = pd.MultiIndex.from_frame(first[label_cols]) if len(label_cols) > 1 else pd.Index(first[label_cols[0]])
+        for df in frames[1:]:
+            other = pd.MultiIndex.from_frame(df[label_cols]) if len(label_cols) > 1 else pd.Index(df[label_cols[0]])
+            labels = labels.append(other[~other.isin(labels)])
+        frames = [df.set_index(label_cols)[value_cols] for df in frames]
+        presence = [labels.isin(df.index) for df in frames]
+        frames = [df.reindex(labels, fill_value=0) for df in frames]
+    stack = np.stack([df[value_cols].to_numpy(dtype=np.float64) for df in frames])
+    t = np.asarray(years)
+    if clamp:
+        t = np.clip(t, anchors[0], anchors[-1])
+    elif ((t < anchors[0]) | (t > anchors[-1])).any():
+        raise ValueError(f"Years {list(years)} outside the anchor years {anchors.tolist()}")
+    if len(anchors) == 1:
+        lo = hi = np.zeros(len(t), dtype=int)
+        w = np.zeros(len(t))
     else:
-        with pd.ExcelWriter(
-            path,
-            engine="openpyxl",
-            mode="w"
-        ) as writer:
-            df.to_excel(writer, sheet_name=sheet_name, index=idx)
+        lo = np.clip(np.searchsorted(anchors, t, side="right") - 1, 0, len(anchors) - 2)
+        hi = lo + 1
+        w = (t - anchors[lo]) / (anchors[hi] - anchors[lo])
+    values = stack[lo] + w[:, None, None] * (stack[hi] - stack[lo])
+    out = {}
+    for k, year in enumerate(years):
+        if t[k] in anchors:
+            # anchor years are returned as they are
+            df = tables[int(t[k])].copy()
+            df[value_cols] = df[value_cols].astype(np.float64)
+            out[year] = df
+            continue
+        df = pd.DataFrame(values[k], columns=value_cols, index=frames[0].index)
+        if label_cols:
+            present = presence[lo[k]] | presence[hi[k]]
+            df = df[present].reset_index()
+        out[year] = df
+    return out
 # ============================================================================
 def interpolate_2035(df_2030, df_2040):
-    df = df_2030.copy()
-    for col in df.columns[1:]:
-        df[col] = df_2030[col] + 0.5 * (df_2040[col] - df_2030[col])
-    return df
+    return interpolate_years({2030: df_2030, 2040: df_2040}, [2035])[2035]
 # ============================================================================
-def build_generator_table(df, year, parameter, nodes, node_map, fuel_map, tech_order):
-    subset = df[
-        (df["Year"] == year) &
-        (df["Parameter"] == parameter)
-    ].copy()
-    subset["Tech_group"] = subset["Fuel"].map(fuel_map)
-    if subset["Tech_group"].isna().any():
-        missing = subset.loc[subset["Tech_group"].isna(), "Fuel"].unique()
+TYNDP22_YEARS = (2030, 2040, 2050)
+# ============================================================================
+def anchor_years_for(years, anchors=TYNDP22_YEARS):
+    # the anchor years needed to interpolate `years`
+    anchors = np.array(anchors)
+    t = np.asarray(years)
+    lo = np.clip(np.searchsorted(anchors, t, side="right") - 1, 0, len(anchors) - 1)
+    hi = np.where(np.isin(t, anchors), lo, np.minimum(lo + 1, len(anchors) - 1))
+    return [int(a) for a in anchors if a in set(anchors[lo]) | set(anchors[hi])]
+# ============================================================================
+def build_generator_cube(df, nodes, fuel_map, parameters=("Dispatch (GWh)", "Capacity (MW)")):
+    # (Year, Parameter, Tech_group) x Node sums of one sheet in a single groupby;
+    # the Fuel -> Tech_group mapping runs on the categories of Fuel only
+    df = df[df["Parameter"].isin(parameters)]
+    fuel = df["Fuel"].astype("category")
+    tech = fuel.cat.categories.map(fuel_map)
+    codes = fuel.cat.codes.to_numpy()
+    unmapped = (codes < 0) | np.isin(codes, np.flatnonzero(tech.isna()))
+    if unmapped.any():
+        missing = df.loc[unmapped, "Fuel"].unique()
         raise ValueError(f"Unmapped Fuel values found: {missing}")
-    pivot = (
-        subset
-        .groupby(["Tech_group", "Node"], as_index=False)["Value"]
+    tech_groups = pd.Index(pd.unique(tech))
+    codes = tech_groups.get_indexer(tech)[codes]
+    tech_group = pd.Categorical.from_codes(codes, categories=tech_groups)
+    cube = (
+        df.assign(Tech_group=tech_group)
+        .groupby(["Year", "Parameter", "Tech_group", "Node"], observed=True)["Value"]
         .sum()
-        .pivot(index="Tech_group", columns="Node", values="Value")
+        .unstack("Node")
         .reindex(columns=nodes, fill_value=0)
-        .reindex(tech_order, fill_value=0)
-        .reset_index()
-        .fillna(0)
     )
-    pivot.rename(columns=node_map, inplace=True)
-    return pivot
+    cube.index = cube.index.set_levels(cube.index.levels[2].astype(object), level="Tech_group")
+    return cube
+# ============================================================================
+def generator_table(cube, year, parameter, node_map, tech_order):
+    # one Tech_group x country table, sliced from build_generator_cube
+    if (year, parameter) in cube.index.droplevel("Tech_group"):
+        table = cube.xs((year, parameter), level=("Year", "Parameter"))
+    else:
+        table = pd.DataFrame(columns=cube.columns, dtype=float)
+    table = table.reindex(tech_order, fill_value=0).fillna(0)
+    table.index.name = "Tech_group"
+    table = table.reset_index()
+    table.rename(columns=node_map, inplace=True)
+    return table
+# ============================================================================
+def build_generator_table(df, year, parameter, nodes, node_map, fuel_map, tech_order):
+    cube = build_generator_cube(df[df["Year"] == year], nodes, fuel_map, parameters=[parameter])
+    return generator_table(cube, year, parameter, node_map, tech_order)
 # ============================================================================
 def build_demand_table(df, year, nodes, node_map):
     subset = df[df["Year"] == year]
@@ -90,445 +479,1520 @@ def build_demand_table(df, year, nodes, node_map):
     return pivot
 # ============================================================================
 def split_hydro(df, df_share):
-    df_idx = df.set_index("Tech_group")
-    hydro = df_idx.loc["Hydro"]
-    hydro_split = df_share.mul(hydro, axis=1)
-    hydro_pos = df_idx.index.get_loc("Hydro")
-    df_before = df_idx.iloc[:hydro_pos]
-    df_after = df_idx.iloc[hydro_pos + 1 :]
-    df_out = (
-        pd.concat([df_before, hydro_split, df_after])
-        .reset_index()
-        .rename(columns={"index": "Tech_group"})
+    return split_hydro_tables({0: df}, {0: df_share})[0]
+# ============================================================================
+def split_hydro_tables(tables, shares):
+    # Replaces the "Hydro" row of every generator table (Tech_group column and
+    # country columns) by its shares (Hydro Dam/RoR x country): {key: table}
+    # and {key: shares} -> {key: split table}. All hydro rows are split in one
+    # broadcast; countries without a share of their own get the mean share of
+    # the others.
+    keys = list(tables)
+    if not keys:
+        return {}
+    hydro = [tables[key].set_index("Tech_group").loc["Hydro"] for key in keys]
+    countries = hydro[0].index
+    share = np.stack([shares[key].reindex(columns=countries).to_numpy(dtype=np.float64) for key in keys])
+    with warnings.catch_warnings():    # all-NaN rows stay NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mean = np.nanmean(share, axis=2, keepdims=True)
+    share = np.where(np.isnan(share), mean, share)
+    split = share * np.stack([h.reindex(countries).to_numpy(dtype=np.float64) for h in hydro])[:, None, :]
+    out = {}
+    for key, values in zip(keys, split):
+        df_idx = tables[key].set_index("Tech_group")
+        hydro_pos = df_idx.index.get_loc("Hydro")
+        hydro_split = pd.DataFrame(values, index=shares[key].index, columns=countries)
+        out[key] = (
+            pd.concat([df_idx.iloc[:hydro_pos], hydro_split, df_idx.iloc[hydro_pos + 1 :]])
+            .reset_index()
+            .rename(columns={"index": "Tech_group"})
+        )
+    return out
+# ============================================================================
+def _open_workbook(path):
+    # .xlsb through pyxlsb, anything else through openpyxl in read-only mode
+    if path.lower().endswith(".xlsb"):
+        from pyxlsb import open_workbook as open_xlsb
+        return open_xlsb(path)
+    return load_workbook(path, read_only=True, data_only=True)
+# ============================================================================
+def _sheet_names(book):
+    if isinstance(book, Workbook):
+        return book.sheetnames
+    return book.sheets
+# ============================================================================
+def _iter_rows(book, sheet_name, skiprows=0):
+    # yields the non-blank rows as lists of cell values (None when empty),
+    # i.e. the rows pd.read_excel counts when it skips blank lines;
+    # skiprows drops raw sheet rows first, as in pd.read_excel(skiprows=n)
+    if isinstance(book, Workbook):
+        for row in book[sheet_name].iter_rows(min_row=skiprows + 1, values_only=True):
+            values = list(row)
+            if any(v is not None and v != "" for v in values):
+                yield values
+        return
+    with book.get_sheet(sheet_name) as sh:
+        for row in sh.rows(sparse=True):
+            if row[0].r < skiprows:
+                continue
+            values = [c.v for c in row]
+            if any(v is not None and v != "" for v in values):
+                yield values
+# ============================================================================
+def _to_float_row(values):
+    # pd.to_numeric(errors="coerce").fillna(0.0) for one row of cells
+    try:
+        row = np.array(values, dtype=np.float64)
+    except (ValueError, TypeError):
+        row = np.array([_to_float(v) for v in values], dtype=np.float64)
+    row[np.isnan(row)] = 0.0
+    return row
+# ============================================================================
+def _to_float(v):
+    try:
+        return float(v)
+    except (ValueError, TypeError):
+        return np.nan
+# ============================================================================
+def _read_yearly_outputs(book, sheet_name, zones, header_row=5):
+    # "Yearly Outputs": zone names in the 6th non-blank row (df.iloc[4] after
+    # pd.read_excel used the first row as header), labels in columns 0 and 1;
+    # only the columns of the requested zones (None: all zones) are kept
+    rows = _iter_rows(book, sheet_name)
+    for _ in range(header_row):
+        next(rows)
+    header = next(rows)
+    if zones is None:
+        keep = [c for c, z in enumerate(header) if c >= 2 and node_country(z) is not None]
+    else:
+        zones = set(zones)
+        keep = [c for c, z in enumerate(header) if isinstance(z, str) and z in zones]
+    labels, values = [], []
+    for row in rows:
+        row = row + [None] * (len(header) - len(row))
+        labels.append([None if v == "" else v for v in row[:2]])
+        values.append([_to_float(row[c]) for c in keep])
+    df = pd.DataFrame(labels, columns=["Category", "Technology"], dtype=object)
+    zone_values = pd.DataFrame(
+        np.array(values, dtype=np.float64).reshape(len(values), len(keep)),
+        columns=[header[c] for c in keep],
+    )
+    return pd.concat([df, zone_values], axis=1)
+# ============================================================================
+def _hourly_header(rows, countries, header_rows=(10, 11), data_row=13, first_col=2):
+    # consumes the header of "Hourly Market Data emarket" from `rows`: categories
+    # and nodes in rows 10 and 11, values from row 13. Returns both header rows
+    # and the columns of nodes in `countries` (None: all nodes).
+    header = {}
+    for r in range(data_row):
+        row = next(rows)
+        if r in header_rows:
+            header[r] = row
+    categories, nodes = header[header_rows[0]], header[header_rows[1]]
+    width = max(len(categories), len(nodes))
+    categories = categories + [None] * (width - len(categories))
+    nodes = nodes + [None] * (width - len(nodes))
+    keep = [
+        c for c in range(first_col, width)
+        if isinstance(categories[c], str) and isinstance(nodes[c], str)
+        and (nodes[c][:2] in countries if countries is not None else node_country(nodes[c]) is not None)
+    ]
+    return categories, nodes, keep
+# ============================================================================
+def _read_hourly_columns(rows, cols, dtype=np.float64):
+    # parses the sheet columns `cols` of the remaining rows straight into a
+    # columns x hours buffer
+    buf = np.zeros((len(cols), 8784), dtype=dtype)
+    n = 0
+    for row in rows:
+        if n == buf.shape[1]:
+            buf = np.concatenate([buf, np.zeros_like(buf)], axis=1)
+        buf[:, n] = _to_float_row([row[c] if c < len(row) else None for c in cols])
+        n += 1
+    return buf[:, :n]
+# ============================================================================
+def _read_hourly_market_data(book, sheet_name, countries):
+    # "Hourly Market Data emarket" as hours x columns with (Category, Node)
+    # columns; only columns of nodes in `countries` are kept
+    rows = _iter_rows(book, sheet_name)
+    categories, nodes, keep = _hourly_header(rows, countries)
+    buf = _read_hourly_columns(rows, keep)
+    columns = pd.MultiIndex.from_arrays(
+        [[categories[c] for c in keep], [nodes[c] for c in keep]], names=["Category", "Node"]
     )
-    return df_out
-# ============================================================================
-def read_profiles(dir_in, fname, nodes, CY):
-    year = CY[2:] 
-    data = {n[:2]: None for n in nodes}   # initialize country containers
-    xls = pd.ExcelFile(os.path.join(dir_in, fname), engine="pyxlsb")
-    for sheet in xls.sheet_names:
-        country = sheet[:2]
-        if country not in data:
+    return pd.DataFrame(buf.T, columns=columns)
+# ============================================================================
+def read_plexos_workbook(path, zones=None, countries=None, hourly=True):
+    # Opens a MMStandardOutputFile_*.xlsb once and returns "Yearly Outputs"
+    # (zone columns in `zones`) and, if hourly, "Hourly Market Data emarket"
+    # (node columns of `countries`, MultiIndex (Category, Node) columns);
+    # None selects all zones or nodes
+    sheet, sheet2 = "Yearly Outputs", "Hourly Market Data emarket"
+    tags = {sheet: ("yearly", None if zones is None else tuple(zones))}
+    if hourly:
+        tags[sheet2] = ("hourly", None if countries is None else tuple(countries))
+    out = {}
+    if USE_CACHE:
+        out = {s: cache_get(path, tag) for s, tag in tags.items()}
+        out = {s: df for s, df in out.items() if df is not None}
+    missing = [s for s in tags if s not in out]
+    if missing:
+        with contextlib.closing(_open_workbook(path)) as book:
+            for s in missing:
+                if s == sheet:
+                    out[s] = _read_yearly_outputs(book, s, zones)
+                else:
+                    out[s] = _read_hourly_market_data(book, s, countries)
+                if USE_CACHE:
+                    cache_put(path, tags[s], out[s])
+    return out
+
+# ============================================================================
+def _header_str(v):
+    # column label as pd.read_excel(...).columns.astype(str) spells it
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v)
+# ============================================================================
+def _read_profile_columns(path, sheet_name, years, skiprows=6):
+    # only the climate-year columns of one Demand_TimeSeries sheet, hours x years
+    with contextlib.closing(_open_workbook(path)) as book:
+        rows = _iter_rows(book, sheet_name, skiprows=skiprows)
+        header = [_header_str(v) for v in next(rows)]
+        for year in years:
+            if year not in header:
+                raise KeyError(f"Climate year {year} not found in {path} [{sheet_name}]")
+        cols = [header.index(year) for year in years]
+        values = [[_to_float(row[col]) if col < len(row) else np.nan for col in cols] for row in rows]
+        return np.array(values, dtype=np.float64).reshape(-1, len(cols))
+# ============================================================================
+def read_profiles_cys(dir_in, fnames, nodes, CYs, workers=1):
+    # Country profiles of several Demand_TimeSeries_*.xlsb files for several
+    # climate years: {CY: [DataFrame per file]}. The sheets of all files are
+    # parsed concurrently on `workers` processes, each sheet once for all
+    # climate years not cached yet, and summed per country (in sheet order)
+    # into one preallocated hours x countries array per file and CY.
+    countries = list(dict.fromkeys(n[:2] for n in nodes))
+    tags = {CY: ("profiles", CY[2:], tuple(countries)) for CY in CYs}
+    results = {}
+    tasks = []
+    for fname in fnames:
+        path = os.path.join(dir_in, fname)
+        missing = []
+        for CY in CYs:
+            df = cache_get(path, tags[CY]) if USE_CACHE else None
+            if df is None:
+                missing.append(CY)
+            else:
+                results[fname, CY] = df
+        if missing:
+            with contextlib.closing(_open_workbook(path)) as book:
+                tasks += [(fname, path, sheet, missing) for sheet in _sheet_names(book) if sheet[:2] in countries]
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            columns = list(pool.map(
+                _read_profile_columns,
+                [t[1] for t in tasks], [t[2] for t in tasks], [[CY[2:] for CY in t[3]] for t in tasks],
+            ))
+    else:
+        columns = [_read_profile_columns(path, sheet, [CY[2:] for CY in missing]) for _, path, sheet, missing in tasks]
+    data = {}
+    seen = {}
+    for (fname, path, sheet, missing), values in zip(tasks, columns):
+        if fname not in data:
+            data[fname] = np.zeros((len(missing), len(values), len(countries)))
+            seen[fname] = set()
+        j = countries.index(sheet[:2])
+        data[fname][:, :, j] += values.T
+        seen[fname].add(j)
+    for (fname, path, sheet, missing) in tasks:
+        if fname not in data:
             continue
-        df = pd.read_excel(
-            xls,
-            sheet_name=sheet,
-            skiprows=6
-        )
-        df.columns = df.columns.astype(str)
-        values = df[year].to_numpy(copy=True)
-        if data[country] is None:
-            data[country] = values
+        arr = data.pop(fname)
+        arr[:, :, [j for j in range(len(countries)) if j not in seen[fname]]] = np.nan
+        for CY, values in zip(missing, arr):
+            results[fname, CY] = pd.DataFrame(values, columns=countries)
+            if USE_CACHE:
+                cache_put(path, tags[CY], results[fname, CY])
+    return {CY: [results[fname, CY] for fname in fnames] for CY in CYs}
+# ============================================================================
+def read_profiles_many(dir_in, fnames, nodes, CY, workers=1):
+    return read_profiles_cys(dir_in, fnames, nodes, [CY], workers=workers)[CY]
+# ============================================================================
+def read_profiles(dir_in, fname, nodes, CY, workers=1):
+    return read_profiles_many(dir_in, [fname], nodes, CY, workers=workers)[0]
+
+# ============================================================================
+HOURS_PER_YEAR = 8760
+# ============================================================================
+def pad_profiles(df, hoy=HOURS_PER_YEAR):
+    # profiles shorter than a year are padded with their last hours and
+    # rescaled so that every column keeps its energy; columns without energy
+    # stay at zero instead of 0 / 0
+    missing = hoy - len(df)
+    if missing <= 0:
+        return df
+    energy = df.sum()
+    df = pd.concat([df, df.tail(missing)], ignore_index=True)
+    total = df.sum()
+    df *= np.divide(energy, total, out=np.zeros(len(total)), where=total != 0)
+    return df
+# ============================================================================
+# Temporal reduction of the hourly profiles: block sums at coarser resolutions
+# and representative days, both keeping the energy of every country
+REDUCED_WORKBOOK = "tyndp_demand_profiles_reduced.xlsx"
+PROFILE_SHEET = re.compile(r"MWh_([A-Z]{2}(?:\d{2})?)_?(\d{4})_(CY\d{4})$")
+SCENARIO_VINTAGE = {"DE": 2024, "GA": 2022, "NT": 2022, "DE22": 2022}
+RESOLUTION_LABELS = {24: "day", 168: "week"}
+# ============================================================================
+def resolution_label(hours):
+    return RESOLUTION_LABELS.get(hours, f"{hours}h")
+# ============================================================================
+def aggregate_profiles(df, hours):
+    # MWh per block of `hours` (the last block may be shorter), indexed by the
+    # first hour of the block
+    starts = np.arange(0, len(df), hours)
+    values = np.add.reduceat(df.to_numpy(dtype=np.float64), starts, axis=0)
+    return pd.DataFrame(values, index=pd.Index(starts, name="hour"), columns=df.columns)
+# ============================================================================
+def _sq_distances(X, C):
+    d = (X**2).sum(axis=1)[:, None] - 2.0 * X @ C.T + (C**2).sum(axis=1)[None, :]
+    return np.maximum(d, 0.0)
+# ============================================================================
+def _seed_centers(D, k, rng):
+    # k-means++ seeding on a (points x points) squared distance matrix
+    centers = [int(rng.integers(len(D)))]
+    d = D[centers[0]].copy()
+    for _ in range(1, k):
+        centers.append(int(rng.choice(len(D), p=d / d.sum())) if d.sum() > 0 else int(rng.integers(len(D))))
+        d = np.minimum(d, D[centers[-1]])
+    return np.array(centers)
+# ============================================================================
+def cluster_days(X, k, method="kmedoids", seed=0, max_iter=100):
+    # (labels, representative day per cluster) of the rows of X; the
+    # representative is the medoid, or for k-means the day closest to the
+    # centroid
+    D = _sq_distances(X, X)
+    rng = np.random.default_rng(seed)
+    medoids = _seed_centers(D, k, rng)
+    if method == "kmeans":
+        centers = X[medoids]
+        for _ in range(max_iter):
+            labels = _sq_distances(X, centers).argmin(axis=1)
+            counts = np.bincount(labels, minlength=k)
+            sums = np.zeros_like(centers)
+            np.add.at(sums, labels, X)
+            new = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centers)
+            if np.array_equal(new, centers):
+                break
+            centers = new
+        labels = _sq_distances(X, centers).argmin(axis=1)
+        return labels, _sq_distances(centers, X).argmin(axis=1)
+    if method != "kmedoids":
+        raise ValueError(f"Unknown clustering method : {method}")
+    for _ in range(max_iter):
+        labels = D[:, medoids].argmin(axis=1)
+        new = medoids.copy()
+        for j in range(k):
+            members = np.flatnonzero(labels == j)
+            if len(members):
+                new[j] = members[D[np.ix_(members, members)].sum(axis=1).argmin()]
+        if np.array_equal(new, medoids):
+            break
+        medoids = new
+    return D[:, medoids].argmin(axis=1), medoids
+# ============================================================================
+def representative_days(df, k, method="kmedoids", seed=0, cache_dir=None):
+    # k representative days of an hourly profile as rows (day, weight, hour,
+    # countries...): day of the year of the representative, weight = number
+    # of days it stands for. Days are clustered on profiles normalised by the
+    # country mean; k-means uses the centroids, k-medoids the medoid days.
+    # Every country is rescaled so that sum(weight * MWh) is its annual energy.
+    values = df.to_numpy(dtype=np.float64)
+    days = len(values) // 24
+    k = min(k, days)
+    def build():
+        valid = ~np.isnan(values).all(axis=0)
+        scale = np.ones(values.shape[1])
+        scale[valid] = np.nanmean(np.abs(values[:, valid]), axis=0)
+        scale[scale == 0] = 1.0
+        X = np.nan_to_num(values[:days * 24] / scale).reshape(days, 24, -1).transpose(0, 2, 1).reshape(days, -1)
+        labels, rep = cluster_days(X, k, method, seed)
+        weight = np.bincount(labels, minlength=k).astype(np.float64)
+        if method == "kmeans":
+            counts = np.maximum(weight, 1)[:, None]
+            sums = np.zeros((k, X.shape[1]))
+            np.add.at(sums, labels, X)
+            profile = (sums / counts).reshape(k, -1, 24).transpose(0, 2, 1) * scale
         else:
-            data[country] += values
-    return pd.DataFrame(data)
+            profile = values[:days * 24].reshape(days, 24, -1)[rep]
+        keep = np.flatnonzero(weight > 0)
+        order = keep[np.argsort(rep[keep])]
+        profile, weight, rep = profile[order], weight[order], rep[order]
+        energy = np.nansum(values, axis=0)
+        # countries without energy stay at zero instead of 0 / 0
+        total = (weight[:, None, None] * profile).sum(axis=(0, 1))
+        factor = np.divide(energy, total, out=np.zeros_like(energy), where=total != 0)
+        profile = profile * factor
+        profile[:, :, ~valid] = np.nan
+        out = pd.DataFrame(profile.reshape(-1, values.shape[1]), columns=[str(c) for c in df.columns])
+        out.insert(0, "hour", np.tile(np.arange(24), len(order)))
+        out.insert(0, "weight", np.repeat(weight, 24))
+        out.insert(0, "day", np.repeat(rep, 24))
+        return out
+    return cached_result(cache_dir, values, ("representative_days", k, method, seed, tuple(map(str, df.columns))), build)
+# ============================================================================
+def reduced_sheets(sheet_name, reduction):
+    # names of the reduced sheets of profile sheet "MWh_{label}_{CY}"
+    names = [f"{sheet_name}_{resolution_label(hours)}" for hours in reduction.get("resolutions", ())]
+    if reduction.get("rep_days"):
+        names.append(f"Rep{reduction['rep_days']}{sheet_name[3:]}")
+    return names
+# ============================================================================
+def reduced_method(workbook, sheet, reduction):
+    # clustering method of a representative-day sheet, kept in its manifest
+    # entry since the sheet name does not carry it; None for other sheets
+    if reduction and workbook == REDUCED_WORKBOOK and sheet.startswith("Rep"):
+        return reduction.get("method", "kmedoids")
+    return None
+# ============================================================================
+def reduce_outputs(outputs, reduction, cache_dir=None):
+    # adds the reduced sheets of every profile sheet of `outputs` to
+    # REDUCED_WORKBOOK. reduction: {"resolutions": [hours, ...], "rep_days":
+    # k or None, "method": "kmedoids" or "kmeans"}
+    for sheet_name, (df, idx) in list(outputs.get("tyndp_demand_profiles.xlsx", {}).items()):
+        match = PROFILE_SHEET.match(sheet_name)
+        scenario, year, CY = match.groups() if match else (None, None, None)
+        vintage = f"TYNDP{SCENARIO_VINTAGE[scenario]}" if match else None
+        names = iter(reduced_sheets(sheet_name, reduction))
+        with stage("transform", vintage, CY, year, f"reduce {sheet_name}") as info:
+            for hours in reduction.get("resolutions", ()):
+                add_sheet(outputs, REDUCED_WORKBOOK, next(names), aggregate_profiles(df, hours), idx=True)
+            if reduction.get("rep_days"):
+                rep = representative_days(
+                    df, reduction["rep_days"], reduction.get("method", "kmedoids"), cache_dir=cache_dir
+                )
+                add_sheet(outputs, REDUCED_WORKBOOK, next(names), rep, idx=False)
+            count_frames(info, df)
+# ============================================================================
+def input_path(dir_in, fname):
+    # .xlsb inputs may also be given re-saved as .xlsx under the same name
+    path = os.path.abspath(os.path.join(dir_in, fname))
+    root, ext = os.path.splitext(path)
+    if ext.lower() == ".xlsb" and not os.path.exists(path) and os.path.exists(root + ".xlsx"):
+        return root + ".xlsx"
+    return path
+# ============================================================================
+PREFETCH = 2
+# ============================================================================
+def prefetch_depth(depth=None):
+    # the number of tasks prefetch runs ahead, see prefetch
+    if depth is None:
+        depth = PREFETCH
+    return 1 if RUN_STATS is not None else depth
+# ============================================================================
+def prefetch(tasks, depth=None):
+    # Yields a Future per (fn, *args) task, in task order. Up to `depth`
+    # (default PREFETCH) tasks run ahead on worker processes while the caller
+    # works on the current result; depth < 2 runs each task inline when it is
+    # taken. While a run report is recorded the tasks always run inline, so
+    # that their time and memory are measured in this process.
+    depth = prefetch_depth(depth)
+    tasks = iter(tasks)
+    if depth < 2:
+        for fn, *args in tasks:
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+            yield future
+        return
+    pool = ProcessPoolExecutor(max_workers=depth)
+    try:
+        queue = collections.deque(pool.submit(*task) for task in itertools.islice(tasks, depth))
+        while queue:
+            future = queue.popleft()
+            queue.extend(pool.submit(*task) for task in itertools.islice(tasks, 1))
+            yield future
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+# ============================================================================
+def tyndp24_inputs(dir_in, CY, year):
+    # main and offshore Plexos output of one TYNDP 2024 target year, e.g. "DE2035"
+    return [
+        input_path(dir_in, f"MMStandardOutputFile_{year}_Plexos_{CY}_v11_SoS.xlsb"),
+        input_path(dir_in, f"MMStandardOutputFile_{year}_Plexos_{CY}_offshore_v11_SoS.xlsb"),
+    ]
+# ============================================================================
+def tyndp22_inputs(dir_in, anchor_years, scenarios=("GA",)):
+    # TYNDP 2022 results workbook and the demand time series of the anchor
+    # years of each scenario code (DE22 reads the DE release)
+    return [input_path(dir_in, "220310_Updated_Electricity_Modelling_Results_TYNDP2022.xlsx")] + [
+        input_path(dir_in, f"Demand_TimeSeries_{year}_{code[:2]}_release.xlsb")
+        for code in scenarios
+        for year in anchor_years
+    ]
+# ============================================================================
+DEMAND_NODES = ["Electrolysis", "Prosumer Node", "Transmission Node", "Transport Node"]
+# ============================================================================
+def classify_hourly_columns(categories, nodes_raw, countries):
+    # categories/nodes_raw: header rows of "Hourly Market Data emarket" (one
+    # entry per column). Returns per column the country index (-1: none), the
+    # DEMAND_NODES class (-1: none) and how often it enters the country profile.
+    cats = pd.Series(categories, dtype=object).reset_index(drop=True)
+    nodes = pd.Series(nodes_raw, dtype=object).reset_index(drop=True)
+    valid = (cats.map(type) == str) & (nodes.map(type) == str)
+    cats = cats.where(valid, "")
+    nodes = nodes.where(valid, "")
+    country_idx = pd.Index(countries).get_indexer(nodes.str[:2])
+    valid &= country_idx >= 0
+    is_demand = valid & cats.str.contains("Demand [MW]", regex=False)
+    is_electrolysis = valid & cats.str.contains("Electrolyser", regex=False)
+    is_prosumer = ~is_electrolysis & is_demand & nodes.str.endswith("RETE")
+    is_transport = (
+        ~is_electrolysis & ~is_prosumer & is_demand
+        & (nodes.str.contains("EV Passenger Prosumer", regex=False)
+           | nodes.str.contains("EV Passenger Street", regex=False))
+    )
+    is_transmission = ~is_electrolysis & ~is_prosumer & ~is_transport & is_demand
+    node_class = np.select(
+        [is_electrolysis, is_prosumer, is_transmission, is_transport], [0, 1, 2, 3], -1
+    )
+    # a column that is both demand and electrolyser enters its profile twice
+    weight = is_demand.to_numpy(dtype=int) + is_electrolysis.to_numpy(dtype=int)
+    return country_idx, node_class, weight
+# ============================================================================
+def accumulate_hourly_demand(data, country_idx, node_class, weight, totals, profiles):
+    # data: columns x hours, C-contiguous, classified by classify_hourly_columns.
+    # Each country profile continues one NumPy sum over axis 0 of a gather that
+    # starts with the running profile, so the columns are added sequentially
+    # in sheet order, exactly as the former per-column loop did, also when the
+    # sheet is passed in column chunks. Column totals are summed in float64.
+    order = np.argsort(country_idx, kind="stable")
+    bounds = np.searchsorted(country_idx[order], np.arange(profiles.shape[1] + 1))
+    for j in range(profiles.shape[1]):
+        group = order[bounds[j]:bounds[j + 1]]
+        cols = np.repeat(group, weight[group])
+        if len(cols):
+            stack = np.empty((len(cols) + 1, profiles.shape[0]))
+            stack[0] = profiles[:, j]
+            stack[1:] = data[cols]
+            profiles[:, j] = stack.sum(axis=0)
+    cols = np.flatnonzero(node_class >= 0)
+    np.add.at(totals, (node_class[cols], country_idx[cols]), data[cols].sum(axis=1, dtype=np.float64))
+# ============================================================================
+def hourly_demand_frames(totals, profiles, countries):
+    # output layout: totals in GWh with a "Total demand" row, profiles in MW
+    totals = pd.DataFrame(totals, index=DEMAND_NODES, columns=countries)
+    totals.loc["Total demand"] = totals.sum()
+    totals /= 1000
+    totals = totals.reset_index().rename(columns={"index": "Demand_node"})
+    profiles = pd.DataFrame(profiles, columns=countries)
+    return totals, profiles
+# ============================================================================
+def classify_hourly_demand(categories, nodes_raw, values, countries):
+    # values: hours x columns float array of "Hourly Market Data emarket"
+    country_idx, node_class, weight = classify_hourly_columns(categories, nodes_raw, countries)
+    # columns x hours, so that every column is contiguous
+    data = np.ascontiguousarray(np.asarray(values, dtype=np.float64).T)
+    totals = np.zeros((len(DEMAND_NODES), len(countries)))
+    profiles = np.zeros((data.shape[1], len(countries)))
+    accumulate_hourly_demand(data, country_idx, node_class, weight, totals, profiles)
+    return hourly_demand_frames(totals, profiles, countries)
+# ============================================================================
+def read_hourly_demand(path, countries, chunk_cols=256, dtype="float64"):
+    # Low-memory variant of read_plexos_workbook + classify_hourly_demand: the
+    # demand columns of "Hourly Market Data emarket" are parsed in chunks of
+    # chunk_cols columns (one pass over the sheet per chunk) into a `dtype`
+    # buffer and reduced chunk by chunk, so the peak memory is bounded by
+    # chunk_cols x hours. Returns (totals, profiles); float64 gives the same
+    # numbers as the full read. countries=None takes all countries of the sheet.
+    sheet_name = "Hourly Market Data emarket"
+    tags = [
+        ("hourly_demand", part, None if countries is None else tuple(countries), dtype)
+        for part in ("totals", "profiles")
+    ]
+    if USE_CACHE:
+        cached = [cache_get(path, tag) for tag in tags]
+        if all(df is not None for df in cached):
+            return tuple(cached)
+    with contextlib.closing(_open_workbook(path)) as book:
+        rows = _iter_rows(book, sheet_name)
+        categories, nodes, keep = _hourly_header(rows, countries)
+        rows.close()
+        if countries is None:
+            countries = sorted({nodes[c][:2] for c in keep})
+        country_idx, node_class, weight = classify_hourly_columns(
+            [categories[c] for c in keep], [nodes[c] for c in keep], countries
+        )
+        needed = np.flatnonzero(weight > 0)
+        chunks = [needed[i:i + chunk_cols] for i in range(0, len(needed), chunk_cols)] or [needed]
+        totals = np.zeros((len(DEMAND_NODES), len(countries)))
+        profiles = None
+        for chunk in chunks:
+            rows = _iter_rows(book, sheet_name)
+            _hourly_header(rows, countries)
+            data = _read_hourly_columns(rows, [keep[i] for i in chunk], dtype=dtype)
+            if profiles is None:
+                profiles = np.zeros((data.shape[1], len(countries)))
+            accumulate_hourly_demand(data, country_idx[chunk], node_class[chunk], weight[chunk], totals, profiles)
+            del data
+    out = hourly_demand_frames(totals, profiles, countries)
+    if USE_CACHE:
+        for tag, df in zip(tags, out):
+            cache_put(path, tag, df)
+    return out
 
 # ============================================================================
-def make_tyndp24(dir_in, dir_out, CY):
-    years = ["DE2035", "DE2050"]
-    nodes = ["AT00", "CH00", "DE00", "FR00", "IT00"]
-    countries = [n[:2] for n in nodes]
+def tyndp24_generator_pivots(df, all_nodes=False):
+    # (GWh, MW) Tech_group x country pivots of a "Yearly Outputs" sheet of a
+    # main TYNDP 2024 workbook, without the offshore generation
+    mappings = load_mappings()["tyndp24"]
+    output_types = ["Annual generation [GWh]", "Installed Capacities [MW]"]
+    tech_order = mappings["tech_order"]
+    df["Category"] = df["Category"].ffill()
+    df = df[df["Technology"].notna()].copy()
+    df["Tech_group"] = map_techs(df["Technology"].astype(str), known=tech_order)
+    df = df[df["Category"].isin(output_types)]
+    #--------------------------------------------------------------------
+    groups = node_columns(df.columns) if all_nodes else zone_columns(df.columns, mappings["zone2country"])
+    df = pd.concat([df, group_sums(df, groups)], axis=1)
+    country_cols = list(groups)
+    df_gen = df[df["Category"] == "Annual generation [GWh]"]
+    df_cap = df[df["Category"] == "Installed Capacities [MW]"]
+    # df_gen[country_cols] = df_gen[country_cols] / 1000.0
+    # df_cap[country_cols] = df_cap[country_cols] / 1000.0
+    gen_pivot = ordered_group_sum(df_gen, "Tech_group", country_cols)
+    cap_pivot = ordered_group_sum(df_cap, "Tech_group", country_cols)
+    idx = [t for t in tech_order if t in gen_pivot.index] + \
+    [t for t in gen_pivot.index if t not in tech_order]
+    return gen_pivot.reindex(idx), cap_pivot.reindex(idx)
+# ============================================================================
+def tyndp24_tables(dir_in, CY, years=None, chunk_cols=None, dtype="float64", all_nodes=False):
+    # TYNDP 2024 results in memory: {"generation": GWh, "capacity": MW,
+    # "demand": GWh, "profiles": MW}, each {year label: DataFrame} with
+    # Tech_group / Demand_node / hour rows and country columns.
+    # chunk_cols: read the hourly demand in column chunks (see read_hourly_demand)
+    # all_nodes: every zone/node of the workbooks, grouped by the country code
+    # of its header, instead of the countries of tyndp_mappings.json
+    if years is None:
+        years = ["DE2035", "DE2050"]
+    mappings = load_mappings()["tyndp24"]
+    nodes = mappings["nodes"]
     sheet = "Yearly Outputs"
     sheet2 = "Hourly Market Data emarket"
-    output_types = ["Annual generation [GWh]", "Installed Capacities [MW]"]
-    zones = ['AT00', 'AT00RETE', 'AT00 SRES', 'CH00', 'CH00 SRES', 'DE00', 'DE00RETE', 'DE00 SRES', 'FR00', 'FR00RETE', 'FR00 SRES','ITCA',
-            'ITCARETE', 'ITCN', 'ITCNRETE', 'ITCS', 'ITCSRETE', 'ITN1', 'ITN1RETE',
-            'ITS1', 'ITS1RETE', 'ITSA', 'ITSARETE', 'ITSI', 'ITSIRETE', 'ITCA SRES', 'ITCN SRES', 'ITCS SRES', 'ITN1 SRES', 'ITS1 SRES', 'ITSA SRES', 'ITSI SRES']
-    zones2 = ['DEOH001 DRES', 'DEOH001OHEL', 'DEOH002 DRES', 'DEOH002OHEL', 'FROH001 DRES', 
-                'FROH001OHEL', 'FROH002 DRES', 'FROH002OHEL', 'FROH003 DRES', 'FROH003OHEL']
-    zone2country = {
-        "AT": ["AT00", "AT00RETE", "AT00 SRES"],
-        "CH": ["CH00", "CH00 SRES"],
-        "DE": ["DE00", "DE00RETE", "DE00 SRES"],
-        "FR": ["FR00", "FR00RETE", "FR00 SRES"],
-        "IT": [
-        "ITCA", "ITCARETE", "ITCN", "ITCNRETE", "ITCS", "ITCSRETE",
-        "ITN1", "ITN1RETE", "ITS1", "ITS1RETE", "ITSA", "ITSARETE",
-        "ITSI", "ITSIRETE", "ITCA SRES", "ITCN SRES", "ITCS SRES", 
-        "ITN1 SRES", "ITS1 SRES", "ITSA SRES", "ITSI SRES"
-        ]
-    }
-    zone2country2 = {
-        "DE": ['DEOH001 DRES', 'DEOH001OHEL', 'DEOH002 DRES', 'DEOH002OHEL'],
-        "FR": ['FROH001 DRES', 'FROH001OHEL', 'FROH002 DRES', 
-                'FROH002OHEL', 'FROH003 DRES', 'FROH003OHEL']
-    }
-    tech_order = [
-        "Hydro Dam",
-        "Hydro RoR",
-        "Solar",
-        "Wind Onshore",
-        "Wind Offshore",
-        "Others renewable",
-        "Biofuels",
-        "Nuclear",
-        "Gas",
-        "Coal and lignite",
-        "Oil",
-        "Others non-renewable",
-        ]
+    zone2country = mappings["zone2country"]
+    zone2country2 = mappings["offshore_zone2country"]
+    if all_nodes:
+        zones = zones2 = countries = None
+    else:
+        zones, zones2 = sum(zone2country.values(), []), sum(zone2country2.values(), [])
+        countries = [n[:2] for n in nodes]
+    tables = {"generation": {}, "capacity": {}, "demand": {}, "profiles": {}}
+    # workbooks of the next target years are parsed while the current one is
+    # processed; the low-memory mode reads one workbook at a time
+    reads = []
+    for year in years:
+        filepath, filepath2 = tyndp24_inputs(dir_in, CY, year)
+        reads.append((read_plexos_workbook, filepath, zones, countries, chunk_cols is None))
+        if chunk_cols is not None:
+            reads.append((read_hourly_demand, filepath, countries, chunk_cols, dtype))
+        reads.append((read_plexos_workbook, filepath2, zones2, None, False))
+    reads = prefetch(reads, depth=1 if chunk_cols is not None else None)
         #------------------------------------------------------------------------
         ### GENERATION
     for year in years:
-        filepath = os.path.abspath(os.path.join(dir_in, "MMStandardOutputFile_" + str(year) + f"_Plexos_{CY}_v11_SoS.xlsb"))
-        filepath2 = os.path.abspath(os.path.join(dir_in, "MMStandardOutputFile_" + str(year) + f"_Plexos_{CY}_offshore_v11_SoS.xlsb"))
+        filepath, filepath2 = tyndp24_inputs(dir_in, CY, year)
         try:
-            df = pd.read_excel(filepath, sheet_name=sheet, engine="pyxlsb")
+            with stage("read", "TYNDP2024", CY, year, os.path.basename(filepath)) as info:
+                plexos = next(reads).result()
+                count_frames(info, *plexos.values())
+                demand = None
+                if chunk_cols is not None:
+                    demand = next(reads).result()
         except:
             print(f"Can not find file :{filepath}\n")
-            return
-        header_row = 4
-        df.columns = df.iloc[header_row]
-        df = df.iloc[header_row+1:].reset_index(drop=True)
-        df.columns = ["Category", "Technology"] + list(df.columns[2:])
-        df["Category"] = df["Category"].ffill()
-        df = df[df["Technology"].notna()].copy()
-        df["Tech_group"] = df["Technology"].astype(str).apply(map_tech)    
-        df = df[df["Category"].isin(output_types)]
-        #------------------------------------------------------------------------
-        for country, zones in zone2country.items():
-            real = [z for z in zones if z in df.columns]
-            df[country] = df[real].sum(axis=1)
-        country_cols = list(zone2country.keys())
-        df_gen = df[df["Category"] == "Annual generation [GWh]"]
-        df_cap = df[df["Category"] == "Installed Capacities [MW]"]
-        # df_gen[country_cols] = df_gen[country_cols] / 1000.0
-        # df_cap[country_cols] = df_cap[country_cols] / 1000.0
-        gen_pivot = df_gen.groupby("Tech_group")[country_cols].sum()
-        cap_pivot = df_cap.groupby("Tech_group")[country_cols].sum()
-        idx = [t for t in tech_order if t in gen_pivot.index] + \
-        [t for t in gen_pivot.index if t not in tech_order]
-        gen_pivot = gen_pivot.reindex(idx)
-        cap_pivot = cap_pivot.reindex(idx)
-        #------------------------------------------------------------------------
+            break
         try:
-            df_offsh = pd.read_excel(filepath2, sheet_name=sheet, engine="pyxlsb")
+            with stage("read", "TYNDP2024", CY, year, os.path.basename(filepath2)) as info:
+                df_offsh = next(reads).result()[sheet]
+                count_frames(info, df_offsh)
         except:
             print(f"Can not find file :{filepath2}\n")
-            return
-        df_offsh.columns = df_offsh.iloc[header_row]
-        df_offsh = df_offsh.iloc[header_row+1:].reset_index(drop=True)
-        df_offsh.columns = ["Category"] + list(df_offsh.columns[1:])
+            break
         #------------------------------------------------------------------------
-        for country, zones2 in zone2country2.items():
-            real = [z for z in zones2 if z in df_offsh.columns]
-            df_offsh[country] = df_offsh[real].sum(axis=1)
-        country_cols = list(zone2country2.keys())
-        df_gen_offsh = df_offsh[df_offsh["Category"] == "Annual generation [GWh]"]
-        # df_gen_offsh[country_cols] = df_gen_offsh[country_cols] / 1000.0
-        gen_offsh_pivot = df_gen_offsh.groupby("Category")[country_cols].sum()
-        gen_pivot.loc['Wind Offshore', ['DE','FR']] += gen_offsh_pivot.loc['Annual generation [GWh]', ['DE','FR']]
+        with stage("transform", "TYNDP2024", CY, year, "generators"):
+            gen_pivot, cap_pivot = tyndp24_generator_pivots(plexos[sheet], all_nodes)
+            #--------------------------------------------------------------------
+            groups = node_columns(df_offsh.columns) if all_nodes else zone_columns(df_offsh.columns, zone2country2)
+            df_offsh = pd.concat([df_offsh, group_sums(df_offsh, groups)], axis=1)
+            country_cols = [c for c in groups if c in gen_pivot.columns]
+            df_gen_offsh = df_offsh[df_offsh["Category"] == "Annual generation [GWh]"]
+            # df_gen_offsh[country_cols] = df_gen_offsh[country_cols] / 1000.0
+            gen_offsh_pivot = ordered_group_sum(df_gen_offsh, "Category", country_cols)
+            gen_pivot.loc['Wind Offshore', country_cols] += gen_offsh_pivot.loc['Annual generation [GWh]', country_cols]
         #------------------------------------------------------------------------
-        out_path = os.path.join(dir_out, "tyndp_generators.xlsx")
-        sheet_gwh = f"GWh_{year}_{CY}"
-        sheet_mw = f"MW_{year}_{CY}"
-        safe_excel_writer(out_path, sheet_gwh, gen_pivot, idx=True)
-        safe_excel_writer(out_path, sheet_mw, cap_pivot, idx=True)
+        tables["generation"][year] = gen_pivot
+        tables["capacity"][year] = cap_pivot
         #------------------------------------------------------------------------
         ### DEMAND
-        try:
-            df = pd.read_excel(filepath, sheet_name=sheet2, engine="pyxlsb", header=None)
-        except:
-            print(f"Can not find file :{filepath}\n")
-            return
-        categories = df.iloc[10, 2:]
-        nodes_raw = df.iloc[11, 2:]
-        data = (
-                df
-                .iloc[13:, 2:]
-                .apply(pd.to_numeric, errors="coerce")
-                .fillna(0.0)
-                .reset_index(drop=True)
-            )
-        profiles = pd.DataFrame(0.0, index=data.index, columns=countries)
-        totals = pd.DataFrame(0.0, index=[
-            "Electrolysis",
-            "Prosumer Node",
-            "Transmission Node",
-            "Transport Node"
-        ], columns=countries)
-
-        for col in data.columns:
-            node = nodes_raw[col]
-            cat = categories[col]
-            if not isinstance(node, str) or not isinstance(cat, str):
-                continue
-            country = node[:2]
-            if country not in countries:
-                continue
-            series = data[col]            
-            is_demand = "Demand [MW]" in cat
-            is_electrolysis = "Electrolyser" in cat
-            if is_demand:
-                profiles[country] += series
-            if is_electrolysis:
-                totals.loc["Electrolysis", country] += series.sum()
-                profiles[country] += series
-            elif is_demand and node.endswith("RETE"):
-                totals.loc["Prosumer Node", country] += series.sum()
-            elif is_demand and (
-                "EV Passenger Prosumer" in node
-                or "EV Passenger Street" in node
-            ):
-                totals.loc["Transport Node", country] += series.sum()
-            elif is_demand:
-                totals.loc["Transmission Node", country] += series.sum()
-        totals.loc["Total demand"] = totals.sum()
-        totals /= 1000
-        totals = totals.reset_index().rename(columns={"index": "Demand_node"})
+        with stage("transform", "TYNDP2024", CY, year, "demand"):
+            if demand is None:
+                hourly = plexos[sheet2]
+                hourly_nodes = hourly.columns.get_level_values("Node")
+                demand = classify_hourly_demand(
+                    hourly.columns.get_level_values("Category"),
+                    hourly_nodes,
+                    hourly.to_numpy(),
+                    countries if countries is not None else sorted({n[:2] for n in hourly_nodes}),
+                )
+            totals, profiles = demand
+            profiles = pad_profiles(profiles)
         #------------------------------------------------------------------------
-        out_path = os.path.abspath(os.path.join(dir_out, "tyndp_demand.xlsx"))
-        safe_excel_writer(out_path, f"GWh_{year}_{CY}", totals, idx=False)
-        out_path = os.path.abspath(os.path.join(dir_out, "tyndp_demand_profiles.xlsx"))
-        safe_excel_writer(out_path, f"MWh_{year}_{CY}", profiles, idx=False)
-    return()
+        tables["demand"][year] = totals.set_index("Demand_node")
+        tables["profiles"][year] = profiles
+    reads.close()
+    return tables
+# ============================================================================
+def make_tyndp24(dir_in, dir_out, CY, years=None, write=True, chunk_cols=None, dtype="float64", all_nodes=False):
+    # Excel sink of tyndp24_tables: returns {workbook: {sheet: (df, idx)}} and
+    # writes it to dir_out if `write`
+    tables = tyndp24_tables(dir_in, CY, years, chunk_cols=chunk_cols, dtype=dtype, all_nodes=all_nodes)
+    outputs = {}
+    for year in tables["generation"]:
+        add_sheet(outputs, "tyndp_generators.xlsx", f"GWh_{year}_{CY}", tables["generation"][year], idx=True)
+        add_sheet(outputs, "tyndp_generators.xlsx", f"MW_{year}_{CY}", tables["capacity"][year], idx=True)
+    for year in tables["demand"]:
+        add_sheet(outputs, "tyndp_demand.xlsx", f"GWh_{year}_{CY}", tables["demand"][year].reset_index(), idx=False)
+        add_sheet(outputs, "tyndp_demand_profiles.xlsx", f"MWh_{year}_{CY}", tables["profiles"][year], idx=False)
+    if write:
+        write_outputs(dir_out, outputs)
+    return outputs
+
 
 # ============================================================================
-def make_tyndp22(dir_in, dir_out, CY):
-    inpath = os.path.abspath(os.path.join(dir_in, "220310_Updated_Electricity_Modelling_Results_TYNDP2022.xlsx"))
-    out_gen = os.path.abspath(os.path.join(dir_out, "tyndp_generators.xlsx"))
-    out_dem = os.path.abspath(os.path.join(dir_out, "tyndp_demand.xlsx"))
-    out_dem_prof = os.path.abspath(os.path.join(dir_out, "tyndp_demand_profiles.xlsx"))
-    nodes = ["AT00", "CH00", "DE00", "FR00", "IT00"]
-    node_map = {"AT00": "AT", "CH00": "CH", "DE00": "DE", "FR00": "FR", "IT00": "IT"}
-    scenario = "Global Ambition"
-    climate_year = CY[:2] + " " + CY[2:]    # add space acc. to naming in data file
-    fuel_map = {
-        "Hydro": "Hydro",
-        "Solar": "Solar",
-        "Wind Onshore": "Wind Onshore",
-        "Wind Offshore": "Wind Offshore",
-        "Other RES": "Others renewable",
-        "Biofuels": "Biofuels",
-        "Nuclear": "Nuclear",
-        "Gas": "Gas",
-        "Coal & Lignite": "Coal and lignite",
-        "Oil": "Oil",
-        "Other Non RES": "Others non-renewable",
-    } 
-    fuel_map2 = {
-        "Battery": "Battery Storage",
-        "DSR": "Demand Side Response",
-        "Gas": "Flexible Gas",
-        "Hydro Pump Storage": "Pump Storage",
-    }  
-    tech_order = [
-            "Hydro",
-            "Solar",
-            "Wind Onshore",
-            "Wind Offshore",
-            "Others renewable",
-            "Biofuels",
-            "Nuclear",
-            "Gas",
-            "Coal and lignite",
-            "Oil",
-            "Others non-renewable",
-            ]
-    tech_order2 = [
-        "Battery Storage",
-        "Demand Side Response",
-        "Flexbile Gas",
-        "Pump Storage",
-    ]
-    # shares come from TYNDP 2024 data
-    share_MW_DE2035 = pd.DataFrame(
-        {
-            "AT": [0.4243, 0.5757],
-            "CH": [0.6720, 0.3280],
-            "DE": [0.1723, 0.8277],
-            "FR": [0.4200, 0.5800],
-            "IT": [0.5550, 0.4450],
-        },
-        index=["Hydro Dam", "Hydro RoR"],
-    )
-    share_MW_DE2050 = pd.DataFrame(
-        {
-            "AT": [0.4239, 0.5761],
-            "CH": [0.6745, 0.3255],
-            "DE": [0.1723, 0.8277],
-            "FR": [0.4200, 0.5800],
-            "IT": [0.5550, 0.4450],
-        },
-        index=["Hydro Dam", "Hydro RoR"],
-    )
-    share_GWh_DE2035 = pd.DataFrame(
-        {
-            "AT": [0.2223, 0.7777],
-            "CH": [0.4162, 0.5838],
-            "DE": [0.0275, 0.9725],
-            "FR": [0.3068, 0.6932],
-            "IT": [0.4132, 0.5868],
-        },
-        index=["Hydro Dam", "Hydro RoR"],
-    )
-    share_GWh_DE2050 = pd.DataFrame(
-        {
-            "AT": [0.2290, 0.7710],
-            "CH": [0.4209, 0.5791],
-            "DE": [0.0273, 0.9727],
-            "FR": [0.3067, 0.6933],
-            "IT": [0.4154, 0.5846],
-        },
-        index=["Hydro Dam", "Hydro RoR"],
-    )
+# Hydro Dam/RoR shares for splitting the TYNDP 2022 "Hydro" rows, taken from
+# the TYNDP 2024 generator tables of the same climate year where its inputs
+# exist and from TYNDP2024_HydroShare.xlsx otherwise
+HYDRO_SHARE_FILE = "TYNDP2024_HydroShare.xlsx"
+HYDRO_TECHS = ["Hydro Dam", "Hydro RoR"]
+HYDRO_UNITS = {"GWh": "Dispatch (GWh)", "MW": "Capacity (MW)"}
+# ============================================================================
+def tyndp24_hydro(path, all_nodes=False):
+    # Hydro Dam/RoR rows of the TYNDP 2024 generator tables of one main Plexos
+    # workbook, indexed by (unit, Tech_group)
+    def load():
+        zones = None if all_nodes else sum(load_mappings()["tyndp24"]["zone2country"].values(), [])
+        yearly = read_plexos_workbook(path, zones, hourly=False)["Yearly Outputs"]
+        pivots = dict(zip(HYDRO_UNITS, tyndp24_generator_pivots(yearly, all_nodes)))
+        return pd.concat(
+            {unit: pivot.reindex(HYDRO_TECHS, fill_value=0) for unit, pivot in pivots.items()},
+            names=["unit", "Tech_group"],
+        )
+    return cached_frame(path, ("hydro", all_nodes), load)
+# ============================================================================
+def read_hydro_share_file(path):
+    # Hydro Dam/RoR values of TYNDP2024_HydroShare.xlsx, indexed by (unit,
+    # year, Tech_group); the file has one block per table headed by its sheet
+    # name (e.g. GWh_DE2035) followed by the country columns
+    def load():
+        raw = pd.read_excel(path, header=None)
+        blocks = {}
+        for i, label in raw[0].items():
+            match = re.fullmatch(r"(GWh|MW)_[A-Z]{2}(\d{4})", str(label))
+            if match is None:
+                continue
+            header = raw.iloc[i, 1:]
+            countries = header.iloc[: header.isna().argmax() if header.isna().any() else len(header)]
+            rows = raw.iloc[i + 1 : i + 1 + len(HYDRO_TECHS)].set_index(0)
+            blocks[match[1], int(match[2])] = (
+                rows.loc[HYDRO_TECHS, countries.index].set_axis(countries.astype(str), axis=1).astype(np.float64)
+            )
+        return pd.concat(blocks, names=["unit", "year", "Tech_group"])
+    return cached_frame(path, ("hydro_share_file",), load)
+# ============================================================================
+def hydro_share_anchors(dir_in, CY):
+    # TYNDP 2024 target years of CY whose main workbook is in dir_in
+    pattern = re.compile(rf"MMStandardOutputFile_DE(\d{{4}})_Plexos_{CY}_v11_SoS\.xls[bx]$")
+    return sorted({int(m[1]) for m in map(pattern.match, os.listdir(dir_in)) if m})
+# ============================================================================
+def hydro_share_inputs(dir_in, CY):
+    # files the hydro shares of CY are computed from, see hydro_share_table
+    anchors = hydro_share_anchors(dir_in, CY)
+    if anchors:
+        return [tyndp24_inputs(dir_in, CY, f"DE{year}")[0] for year in anchors]
+    return [input_path(dir_in, HYDRO_SHARE_FILE)]
+# ============================================================================
+def hydro_share_table(dir_in, CYs, years, all_nodes=False):
+    # Dam/RoR shares of Hydro for every CY and target year, indexed by (unit,
+    # CY, year, Tech_group) with one column per country. The TYNDP 2024 target
+    # years found in dir_in are the anchors of a CY (HYDRO_SHARE_FILE if there
+    # are none); shares are interpolated between them, for all years at once,
+    # and held constant outside.
+    fallback = None
+    parts = {}
+    for CY in CYs:
+        anchors = hydro_share_anchors(dir_in, CY)
+        if anchors:
+            values = {
+                year: tyndp24_hydro(tyndp24_inputs(dir_in, CY, f"DE{year}")[0], all_nodes) for year in anchors
+            }
+        else:
+            if fallback is None:
+                fallback = read_hydro_share_file(input_path(dir_in, HYDRO_SHARE_FILE))
+            values = {year: fallback.xs(year, level="year") for year in fallback.index.unique("year")}
+        parts[CY] = pd.concat(values, names=["year"]).reorder_levels(["unit", "year", "Tech_group"])
+    table = pd.concat(parts, names=["CY"]).reorder_levels(["unit", "CY", "year", "Tech_group"]).sort_index()
+    # values -> shares per (unit, CY, year), then interpolated over the years
+    table = table / table.groupby(level=["unit", "CY", "year"]).transform("sum")
+    out = {}
+    for (unit, CY), df in table.groupby(level=["unit", "CY"]):
+        anchors = {year: df.xs(year, level="year").droplevel(["unit", "CY"]).reset_index()
+                   for year in df.index.unique("year")}
+        for year, share in interpolate_years(anchors, list(years), clamp=True).items():
+            out[unit, CY, year] = share.set_index("Tech_group")
+    return pd.concat(out, names=["unit", "CY", "year"])
+# ============================================================================
+def tyndp22_scenario_keys(CYs, scenarios):
+    # (scenario code, CY) -> (Scenario, Climate Year) labels of the results workbook
+    names = load_mappings()["tyndp22"]["scenarios"]
+    return {
+        (code, CY): (names[code], CY[:2] + " " + CY[2:])    # add space acc. to naming in data file
+        for code in scenarios for CY in CYs
+    }
+# ============================================================================
+def group_scenarios(df, keys):
+    # {key: rows} of a long TYNDP 2022 sheet for each (Scenario, Climate Year)
+    # of `keys` ({key: labels}), split in one groupby instead of one mask each
+    positions = df.groupby(["Scenario", "Climate Year"], sort=False).indices
+    empty = np.array([], dtype=np.intp)
+    return {key: df.iloc[positions.get(labels, empty)] for key, labels in keys.items()}
+# ============================================================================
+def tyndp22_tables(dir_in, CY, years=(2035, 2050), workers=1, all_nodes=False, scenario="GA"):
+    # TYNDP 2022 results of one scenario and climate year, see tyndp22_tables_many
+    return tyndp22_tables_many(dir_in, [CY], years, [scenario], workers=workers, all_nodes=all_nodes)[(scenario, CY)]
+# ============================================================================
+def tyndp22_tables_many(dir_in, CYs, years=(2035, 2050), scenarios=("GA",), workers=1, all_nodes=False):
+    # TYNDP 2022 results in memory for every (scenario code, CY), laid out as
+    # tyndp24_tables with integer target years as keys. Each sheet of the
+    # results workbook is read once and split by (Scenario, Climate Year);
+    # the values are None if the results workbook is missing. Scenario codes
+    # are those of tyndp_mappings.json (GA: Global Ambition, NT: National
+    # Trends, DE22: Distributed Energy). Target years whose anchor years are
+    # not in the workbook for a scenario and CY are skipped with a message and
+    # left out of its tables.
+    # all_nodes: every node of the workbook summed per country code instead of
+    # the nodes of tyndp_mappings.json
+    inpath = tyndp22_inputs(dir_in, [])[0]
+    mappings = load_mappings()["tyndp22"]
+    nodes = mappings["nodes"]
+    node_map = mappings["node_map"]
+    keys = tyndp22_scenario_keys(CYs, scenarios)
+    results = {key: None for key in keys}
+    # target years outside the anchor years cannot be interpolated
+    outside = [year for year in years if not TYNDP22_YEARS[0] <= year <= TYNDP22_YEARS[-1]]
+    if outside:
+        print(
+            f"No TYNDP 2022 data : {' '.join(map(str, outside))} outside "
+            f"{TYNDP22_YEARS[0]}-{TYNDP22_YEARS[-1]}, skipped\n"
+        )
+        years = [year for year in years if year not in outside]
+        if not years:
+            return {key: {"generation": {}, "capacity": {}, "demand": {}, "profiles": {}} for key in keys}
+    anchor_years = anchor_years_for(years)
+    fuel_map = mappings["fuel_map"]
+    fuel_map2 = mappings["flexibility_fuel_map"]
+    tech_order = mappings["tech_order"]
+    tech_order2 = mappings["flexibility_tech_order"]
     #------------------------------------------------------------------------
+    # the sheets and demand time series are parsed ahead while the previous
+    # ones are processed; with all_nodes the time series need the nodes of
+    # the "Capacity & Dispatch" sheet and are read after it, and with several
+    # workers they are read in place on their own pool instead of opening
+    # that pool inside a prefetch process. The time series files depend on
+    # the anchor years found in the "Capacity & Dispatch" sheet, so their
+    # reads are submitted once it has been processed.
+    reads = [(read_excel_cached, inpath, sheet_name) for sheet_name in ("Capacity & Dispatch", "Flexibility", "Demand")]
+    reads = prefetch(reads)
+    inline = all_nodes or workers > 1
     try:
-        df = pd.read_excel(inpath, sheet_name="Capacity & Dispatch")
+        with stage("read", "TYNDP2022", list(CYs), list(years), "Capacity & Dispatch") as info:
+            df = next(reads).result()
+            count_frames(info, df)
     except:
         print(f"Can not find file :{inpath}\n")
-        return
+        reads.close()
+        return results
     df["Year"] = df["Year"].astype(int)
-    df = df[
-        (df["Node"].isin(nodes))
-        & (df["Scenario"] == scenario)
-        & (df["Climate Year"] == climate_year)
-        & (df["Year"].isin([2030, 2040, 2050]))
+    if all_nodes:
+        df = nodes_to_countries(df)
+        nodes = sorted(pd.concat(group_scenarios(df, keys).values())["Node"].unique())
+        node_map = {n: n for n in nodes}
+    df = group_scenarios(df[(df["Node"].isin(nodes)) & (df["Year"].isin(anchor_years))], keys)
+    # target years of each (scenario, CY) whose anchor years are all present
+    key_years = {}
+    for key in keys:
+        found = set(df[key]["Year"])
+        missing = [year for year in anchor_years if year not in found]
+        key_years[key] = [year for year in years if not set(anchor_years_for([year])) & set(missing)]
+        if missing:
+            skipped = [year for year in years if year not in key_years[key]]
+            print(
+                f"No TYNDP 2022 data : {keys[key][0]} {key[1]} {' '.join(map(str, missing))}, "
+                f"skipped {' '.join(map(str, skipped))}\n"
+            )
+    active = [key for key in keys if key_years[key]]
+    for key in keys:
+        if not key_years[key]:
+            results[key] = {"generation": {}, "capacity": {}, "demand": {}, "profiles": {}}
+    code_anchors, fnames = {}, {}
+    for code in scenarios:
+        code_years = sorted({year for key in active if key[0] == code for year in key_years[key]})
+        code_anchors[code] = anchor_years_for(code_years) if code_years else []
+        fnames[code] = [os.path.basename(f) for f in tyndp22_inputs(dir_in, code_anchors[code], [code])[1:]]
+    profile_tasks = [] if inline else [
+        (read_profiles_cys, dir_in, fnames[code], nodes, list(CYs), workers) for code in scenarios if fnames[code]
     ]
+    profile_reads = prefetch(profile_tasks)
+    if profile_tasks and prefetch_depth() >= 2:
+        # taking the first Future submits the reads without waiting for them
+        profile_futures = itertools.chain([next(profile_reads)], profile_reads)
+    else:
+        profile_futures = profile_reads
     #------------------------------------------------------------------------
     try:
-        df2 = pd.read_excel(inpath, sheet_name="Flexibility")
+        with stage("read", "TYNDP2022", list(CYs), list(years), "Flexibility") as info:
+            df2 = next(reads).result()
+            count_frames(info, df2)
     except:
         print(f"Can not find file :{inpath}\n")
-        return
+        reads.close()
+        profile_reads.close()
+        return results
     df2["Year"] = df2["Year"].astype(int)
-    df2 = df2[
-        (df2["Node"].isin(nodes))
-        & (df2["Scenario"] == scenario)
-        & (df2["Climate Year"] == climate_year)
-        & (df2["Year"].isin([2030, 2040, 2050]))
-    ]
-    #------------------------------------------------------------------------
-    gwh_2050 = build_generator_table(df, 2050, "Dispatch (GWh)", nodes, node_map, fuel_map, tech_order)
-    mw_2050 = build_generator_table(df, 2050, "Capacity (MW)", nodes, node_map, fuel_map, tech_order)
-    gwh_2050_flex = build_generator_table(df2, 2050, "Dispatch (GWh)", nodes, node_map, fuel_map2, tech_order2)
-    mw_2050_flex = build_generator_table(df2, 2050, "Capacity (MW)", nodes, node_map, fuel_map2, tech_order2)
-    gwh_2050 = pd.concat([gwh_2050, gwh_2050_flex], ignore_index=True)
-    mw_2050 = pd.concat([mw_2050, mw_2050_flex], ignore_index=True)
-    gwh_2050 = split_hydro(gwh_2050, share_GWh_DE2050)
-    mw_2050 = split_hydro(mw_2050, share_MW_DE2050)
-    safe_excel_writer(out_gen, f"GWh_GA2050_{CY}", gwh_2050, idx=False)
-    safe_excel_writer(out_gen, f"MW_GA2050_{CY}", mw_2050, idx=False)
+    if all_nodes:
+        df2 = nodes_to_countries(df2)
+    df2 = group_scenarios(df2[(df2["Node"].isin(nodes)) & (df2["Year"].isin(anchor_years))], keys)
     #------------------------------------------------------------------------
-    gwh_2030 = build_generator_table(df, 2030, "Dispatch (GWh)", nodes, node_map, fuel_map, tech_order)
-    gwh_2040 = build_generator_table(df, 2040, "Dispatch (GWh)", nodes, node_map, fuel_map, tech_order)
-    gwh_2030_flex = build_generator_table(df2, 2030, "Dispatch (GWh)", nodes, node_map, fuel_map2, tech_order2)
-    gwh_2040_flex = build_generator_table(df2, 2040, "Dispatch (GWh)", nodes, node_map, fuel_map2, tech_order2)
-    gwh_2030 = pd.concat([gwh_2030, gwh_2030_flex], ignore_index=True)
-    gwh_2040 = pd.concat([gwh_2040, gwh_2040_flex], ignore_index=True)
-    mw_2030 = build_generator_table(df, 2030, "Capacity (MW)", nodes, node_map, fuel_map, tech_order)
-    mw_2040 = build_generator_table(df, 2040, "Capacity (MW)", nodes, node_map, fuel_map, tech_order)
-    mw_2030_flex = build_generator_table(df2, 2030, "Capacity (MW)", nodes, node_map, fuel_map2, tech_order2)
-    mw_2040_flex = build_generator_table(df2, 2040, "Capacity (MW)", nodes, node_map, fuel_map2, tech_order2)
-    mw_2030 = pd.concat([mw_2030, mw_2030_flex], ignore_index=True)
-    mw_2040 = pd.concat([mw_2040, mw_2040_flex], ignore_index=True)
-    #------------------------------------------------------------------------
-    gwh_2035 = interpolate_2035(gwh_2030, gwh_2040)
-    mw_2035 = interpolate_2035(mw_2030, mw_2040)
-    gwh_2035 = split_hydro(gwh_2035, share_GWh_DE2035)
-    mw_2035 = split_hydro(mw_2035, share_MW_DE2035)
-    safe_excel_writer(out_gen, f"GWh_GA2035_{CY}", gwh_2035, idx=False)
-    safe_excel_writer(out_gen, f"MW_GA2035_{CY}", mw_2035, idx=False)
+    with stage("transform", "TYNDP2022", list(CYs), list(years), "hydro shares"):
+        shares = hydro_share_table(dir_in, CYs, years, all_nodes)
+    unsplit = {}
+    for key in active:
+        code, CY = key
+        key_anchors = anchor_years_for(key_years[key])
+        results[key] = {"generation": {}, "capacity": {}, "demand": {}, "profiles": {}}
+        with stage("transform", "TYNDP2022", CY, key_years[key], f"{code} generators"):
+            cubes = [
+                (build_generator_cube(df[key], nodes, fuel_map), tech_order),
+                (build_generator_cube(df2[key], nodes, fuel_map2), tech_order2),
+            ]
+            anchor_tables = {
+                (year, parameter): pd.concat(
+                    [generator_table(cube, year, parameter, node_map, order) for cube, order in cubes],
+                    ignore_index=True,
+                )
+                for year in key_anchors
+                for parameter in HYDRO_UNITS.values()
+            }
+            for unit, parameter in HYDRO_UNITS.items():
+                gen = interpolate_years({year: anchor_tables[(year, parameter)] for year in key_anchors}, key_years[key])
+                for year in key_years[key]:
+                    unsplit[key, unit, year] = gen[year]
+    # the hydro of all tables is split in one broadcast
+    with stage("transform", "TYNDP2022", list(CYs), list(years), "split hydro"):
+        split = split_hydro_tables(unsplit, {k: shares.loc[(k[1], k[0][1], k[2])] for k in unsplit})
+    for (key, unit, year), table in split.items():
+        kind = "generation" if unit == "GWh" else "capacity"
+        results[key][kind][year] = table.set_index("Tech_group")
     #------------------------------------------------------------------------
     try:
-        df = pd.read_excel(inpath, sheet_name="Demand")
+        with stage("read", "TYNDP2022", list(CYs), list(years), "Demand") as info:
+            df = next(reads).result()
+            count_frames(info, df)
     except:
         print(f"Can not find file :{inpath}\n")
-        return
+        reads.close()
+        profile_reads.close()
+        return results
     df["Year"] = df["Year"].astype(int)
-    df = df[
-        (df["Node"].isin(nodes))
-        & (df["Scenario"] == scenario)
-        & (df["Climate Year"] == climate_year)
-        & (df["Parameter"] == "Native Demand (GWh)")
-        & (df["Year"].isin([2030, 2040, 2050]))
-    ]
-    #------------------------------------------------------------------------
-    dem_2050 = build_demand_table(df, 2050, nodes, node_map)
-    sum_nodes = [
-        "Electrolysis Config 1",
-        "Prosumer Node",
-        "Transmission Node",
-        "Transport Node",
-    ]
-    dem_2050.loc[len(dem_2050)] = (
-        ["Total demand"]
-        + dem_2050
-        .loc[dem_2050["Demand_node"].isin(sum_nodes), dem_2050.columns[1:]]
-        .sum()
-        .tolist()
-    )
-    safe_excel_writer(out_dem, f"GWh_GA2050_{CY}", dem_2050, idx=False)
-    dem_2030 = build_demand_table(df, 2030, nodes, node_map)
-    dem_2040 = build_demand_table(df, 2040, nodes, node_map)
-    dem_2035 = interpolate_2035(dem_2030, dem_2040)
-    dem_2035.loc[len(dem_2035)] = (
-        ["Total demand"]
-        + dem_2035
-        .loc[dem_2035["Demand_node"].isin(sum_nodes), dem_2035.columns[1:]]
-        .sum()
-        .tolist()
+    if all_nodes:
+        df = nodes_to_countries(df)
+    df = group_scenarios(
+        df[
+            (df["Node"].isin(nodes))
+            & (df["Parameter"] == "Native Demand (GWh)")
+            & (df["Year"].isin(anchor_years))
+        ],
+        keys,
     )
-    safe_excel_writer(out_dem, f"GWh_GA2035_{CY}", dem_2035, idx=False)
     #------------------------------------------------------------------------
-    df_2050 = read_profiles(dir_in, "Demand_TimeSeries_2050_GA_release.xlsb", nodes, CY)
-    df_2030 = read_profiles(dir_in, "Demand_TimeSeries_2030_GA_release.xlsb", nodes, CY)
-    df_2040 = read_profiles(dir_in, "Demand_TimeSeries_2040_GA_release.xlsb", nodes, CY)
-    df_2035 = df_2030 + 0.5 * (df_2040 - df_2030)
-    safe_excel_writer(out_dem_prof, f"MWh_GA2035_{CY}", df_2035, idx=False)
-    safe_excel_writer(out_dem_prof, f"MWh_GA2050_{CY}", df_2050, idx=False)
-    return()
+    sum_nodes = mappings["total_demand_nodes"]
+    for key in active:
+        code, CY = key
+        with stage("transform", "TYNDP2022", CY, key_years[key], f"{code} demand"):
+            dem = interpolate_years(
+                {year: build_demand_table(df[key], year, nodes, node_map) for year in anchor_years_for(key_years[key])},
+                key_years[key],
+            )
+            for year in key_years[key]:
+                dem_year = dem[year]
+                dem_year.loc[len(dem_year)] = (
+                    ["Total demand"]
+                    + dem_year
+                    .loc[dem_year["Demand_node"].isin(sum_nodes), dem_year.columns[1:]]
+                    .sum()
+                    .tolist()
+                )
+                results[key]["demand"][year] = dem_year.set_index("Demand_node")
+    #------------------------------------------------------------------------
+    for code in scenarios:
+        if not fnames[code]:
+            continue
+        try:
+            with stage("read", "TYNDP2022", list(CYs), list(years), f"{code} Demand_TimeSeries") as info:
+                if inline:
+                    profiles = read_profiles_cys(dir_in, fnames[code], nodes, list(CYs), workers)
+                else:
+                    profiles = next(profile_futures).result()
+                count_frames(info, *[p for dfs in profiles.values() for p in dfs])
+        except:
+            print(f"Can not find file :{', '.join(fnames[code])}\n")
+            continue
+        for CY in CYs:
+            if (code, CY) not in active:
+                continue
+            target_years = key_years[(code, CY)]
+            with stage("transform", "TYNDP2022", CY, target_years, f"{code} profiles"):
+                by_year = interpolate_years(dict(zip(code_anchors[code], profiles[CY])), target_years)
+            results[(code, CY)]["profiles"] = {year: by_year[year] for year in target_years}
+    reads.close()
+    profile_reads.close()
+    return results
+# ============================================================================
+def tyndp22_label(code, year):
+    # sheet label of a TYNDP 2022 scenario and target year: GA2035, DE22_2035
+    return f"{code}{year}" if len(code) == 2 else f"{code}_{year}"
+# ============================================================================
+def tyndp22_outputs(tables, CY, code="GA"):
+    # {workbook: {sheet: (df, idx)}} of one scenario and climate year. As in
+    # earlier versions, the generator and demand sheets of the anchor years
+    # (GA2050) come before the interpolated ones (GA2035).
+    outputs = {}
+    anchors_first = lambda years: sorted(years, key=lambda year: year not in TYNDP22_YEARS)
+    for year in anchors_first(tables["generation"]):
+        for kind, unit in (("generation", "GWh"), ("capacity", "MW")):
+            add_sheet(
+                outputs, "tyndp_generators.xlsx", f"{unit}_{tyndp22_label(code, year)}_{CY}",
+                tables[kind][year].reset_index(), idx=False,
+            )
+    for year in anchors_first(tables["demand"]):
+        add_sheet(
+            outputs, "tyndp_demand.xlsx", f"GWh_{tyndp22_label(code, year)}_{CY}",
+            tables["demand"][year].reset_index(), idx=False,
+        )
+    for year in tables["profiles"]:
+        add_sheet(
+            outputs, "tyndp_demand_profiles.xlsx", f"MWh_{tyndp22_label(code, year)}_{CY}",
+            tables["profiles"][year], idx=False,
+        )
+    return outputs
+# ============================================================================
+def make_tyndp22(dir_in, dir_out, CY, years=(2035, 2050), write=True, workers=1, all_nodes=False, scenario="GA"):
+    # Excel sink of tyndp22_tables, see make_tyndp24
+    tables = tyndp22_tables(dir_in, CY, years, workers=workers, all_nodes=all_nodes, scenario=scenario)
+    if tables is None:
+        return
+    outputs = tyndp22_outputs(tables, CY, scenario)
+    if write:
+        write_outputs(dir_out, outputs)
+    return outputs
 
+
+# ============================================================================
+TABLE_DIMS = {"generation": "tech", "capacity": "tech", "demand": "demand_node", "profiles": "hour"}
+# ============================================================================
+def tyndp_results(dir_in, CYs, years=(2035, 2050), vintages=(2024, 2022), workers=1, all_nodes=False,
+                  chunk_cols=None, dtype="float64", scenarios=("GA",)):
+    # All tables of both vintages in memory, without Excel: {kind: Series}
+    # with a (vintage, scenario, CY, year, tech|demand_node|hour, country)
+    # MultiIndex per kind of TABLE_DIMS. TYNDP 2024 is Distributed Energy
+    # ("DE"), TYNDP 2022 covers the scenario codes in `scenarios` (DE22 is
+    # labelled DE under vintage 2022).
+    names = ["vintage", "scenario", "CY", "year"]
+    parts = {kind: [] for kind in TABLE_DIMS}
+    results = []
+    if 2024 in vintages:
+        for CY in CYs:
+            tables = tyndp24_tables(
+                dir_in, CY, [f"DE{year}" for year in years], chunk_cols=chunk_cols, dtype=dtype, all_nodes=all_nodes,
+            )
+            results.append((2024, "DE", CY, tables))
+    if 2022 in vintages:
+        tables = tyndp22_tables_many(dir_in, CYs, years, scenarios, workers=workers, all_nodes=all_nodes)
+        results += [(2022, code[:2], CY, tables[(code, CY)]) for code in scenarios for CY in CYs]
+    for vintage, scenario, CY, tables in results:
+        for kind, by_year in (tables or {}).items():
+            for label, df in by_year.items():
+                year = int(str(label)[-4:])
+                index = pd.MultiIndex.from_product(
+                    [[vintage], [scenario], [CY], [year], df.index, df.columns],
+                    names=names + [TABLE_DIMS[kind], "country"],
+                )
+                parts[kind].append(pd.Series(df.to_numpy(dtype=np.float64).ravel(), index=index, name=kind))
+    return {
+        kind: pd.concat(series) if series else pd.Series(name=kind, dtype=np.float64)
+        for kind, series in parts.items()
+    }
+# ============================================================================
+def tyndp_dataset(dir_in, CYs, years=(2035, 2050), vintages=(2024, 2022), **kwargs):
+    # tyndp_results as a labelled xarray.Dataset (xarray is only needed here);
+    # combinations missing from the inputs are NaN
+    import xarray as xr
+    results = tyndp_results(dir_in, CYs, years=years, vintages=vintages, **kwargs)
+    return xr.Dataset({
+        kind: xr.DataArray.from_series(series)
+        for kind, series in results.items() if len(series)
+    })
+# ============================================================================
+# Hourly profiles of all vintages, climate years and target years in one
+# chunked HDF5 file (optional, needs h5py): one (country, hour) dataset per
+# {vintage}/{scenario}/{CY}/{year}, stored per country in chunks of STORE_CHUNK_HOURS
+# so that a country/time window only decompresses the chunks it touches
+STORE_NAME = "tyndp_profiles.h5"
+STORE_CHUNK_HOURS = 730
+# ============================================================================
+def store_profiles(path, outputs):
+    # adds the profile sheets of `outputs` to the store at path; entries of the
+    # same (vintage, scenario, CY, year) are replaced, all others are kept
+    import h5py
+    sheets = outputs.get("tyndp_demand_profiles.xlsx", {})
+    with stage("write", name=os.path.basename(path)) as info:
+        with h5py.File(path, "a") as f:
+            for sheet_name, (df, idx) in sheets.items():
+                match = PROFILE_SHEET.match(sheet_name)
+                if match is None:
+                    continue
+                code, year, CY = match.groups()
+                key = f"{SCENARIO_VINTAGE[code]}/{code[:2]}/{CY}/{year}"
+                if key in f:
+                    del f[key]
+                data = df.to_numpy(dtype=np.float64).T
+                ds = f.create_dataset(
+                    key, data=data, chunks=(1, min(STORE_CHUNK_HOURS, data.shape[1])),
+                    compression="gzip", compression_opts=4, shuffle=True,
+                )
+                ds.attrs["countries"] = [str(c) for c in df.columns]
+                info["sheets"] = info.get("sheets", 0) + 1
+        info["bytes"] = os.path.getsize(path)
+# ============================================================================
+def profile_store_keys(path):
+    # (vintage, scenario, CY, year) entries of the store
+    import h5py
+    with h5py.File(path, "r") as f:
+        return [
+            (int(vintage), scenario, CY, int(year))
+            for vintage in f for scenario in f[vintage]
+            for CY in f[vintage][scenario] for year in f[vintage][scenario][CY]
+        ]
+# ============================================================================
+def read_profile_store(path, CY, year, vintage=2024, scenario=None, countries=None, start=0, stop=None):
+    # MW profiles of hours [start, stop) as an (hour, country) DataFrame; only
+    # the requested countries and hours are read from the file. scenario
+    # defaults to DE for 2024 and GA for 2022.
+    import h5py
+    if scenario is None:
+        scenario = "DE" if vintage == 2024 else "GA"
+    with h5py.File(path, "r") as f:
+        ds = f[f"{vintage}/{scenario}/{CY}/{year}"]
+        stored = list(ds.attrs["countries"])
+        countries = stored if countries is None else list(countries)
+        rows = [stored.index(c) for c in countries]
+        stop = ds.shape[1] if stop is None else stop
+        order = np.argsort(rows)
+        data = ds[np.asarray(rows)[order].tolist(), start:stop] if rows else np.empty((0, stop - start))
+    return pd.DataFrame(data[np.argsort(order)].T, index=pd.RangeIndex(start, stop), columns=countries)
 # ============================================================================
 def mod_tyndp24(dir_out, CY):
+    # pads profiles of already written TYNDP 2024 outputs; new runs of
+    # make_tyndp24 pad in memory before writing
     inpath = os.path.abspath(os.path.join(dir_out, "tyndp_demand_profiles.xlsx"))
     sheet = [f"MWh_DE2035_{CY}", f"MWh_DE2050_{CY}"]
-    hoy = 8760
+    outputs = {}
     for s in sheet:
         try:
             df = pd.read_excel(inpath, sheet_name=s)
         except:
             print(f"Can not find file :{inpath}\n")
-            return
-        missing = hoy - len(df)
-        if missing > 0:
-            sum = df.sum()
-            to_add = df.tail(missing)
-            df = pd.concat([df, to_add], ignore_index=True)
-            df *= sum / df.sum()
-            safe_excel_writer(inpath, s, df, idx=False)
-        elif missing == 0:
-            pass
-    return()
+            break
+        if len(df) < HOURS_PER_YEAR:
+            add_sheet(outputs, os.path.basename(inpath), s, pad_profiles(df), idx=False)
+    write_outputs(dir_out, outputs)
+    return outputs
 
 # ============================================================================
-def main(run_mode = 101):
-    start_time = time.perf_counter()  
-    CY = 'CY1995'   # CY1995 or CY2008
+MANIFEST_NAME = "tyndp_manifest.json"
+# ============================================================================
+def code_fingerprint():
+    # the script and its label mappings
+    return file_hash(os.path.abspath(__file__)) + file_hash(MAPPINGS_FILE)
+# ============================================================================
+def unit_inputs(unit):
+    run_mode, dir_in, dir_out, CY, years, workers, scenarios = unit
+    if run_mode == 101:
+        return [path for year in years for path in tyndp24_inputs(dir_in, CY, year)]
+    # time series files that do not exist belong to skipped target years (or
+    # leave their profile sheets unbuilt, which keeps the unit stale)
+    inpath, *profiles = tyndp22_inputs(dir_in, anchor_years_for(years), scenarios)
+    return [inpath] + [path for path in profiles if os.path.exists(path)] + hydro_share_inputs(dir_in, CY)
+# ============================================================================
+def unit_sheets(unit, reduction=None, labels=None):
+    # (workbook, sheet) pairs a unit writes, with the reduced profile sheets
+    # if a reduction is given (see reduce_outputs); labels restricts them to
+    # some of its sheet labels (DE2035, GA2050, ...)
+    run_mode, dir_in, dir_out, CY, years, workers, scenarios = unit
+    if labels is None:
+        labels = years if run_mode == 101 else [tyndp22_label(code, year) for code in scenarios for year in years]
+    sheets = []
+    for label in labels:
+        sheets += [
+            ("tyndp_generators.xlsx", f"GWh_{label}_{CY}"),
+            ("tyndp_generators.xlsx", f"MW_{label}_{CY}"),
+            ("tyndp_demand.xlsx", f"GWh_{label}_{CY}"),
+            ("tyndp_demand_profiles.xlsx", f"MWh_{label}_{CY}"),
+        ]
+        if reduction:
+            sheets += [(REDUCED_WORKBOOK, name) for name in reduced_sheets(f"MWh_{label}_{CY}", reduction)]
+    return sheets
+# ============================================================================
+def load_manifest(dir_out):
+    # {"workbook/sheet": {"unit": ..., "inputs": {path: content hash}, "code": hash}}
+    path = os.path.join(dir_out, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+# ============================================================================
+def unit_dtype(unit, dtype):
+    # dtype of the hourly data behind the sheets of a unit, kept in their
+    # manifest entries when it is not float64; None for TYNDP 2022 units
+    if unit[0] != 101 or dtype == "float64":
+        return None
+    return dtype
+# ============================================================================
+def unit_is_fresh(unit, manifest, code, reduction=None, dtype="float64"):
+    # fresh when every sheet of the unit is in its workbook and was built from
+    # the current inputs with the current code, reduction and dtype
+    dir_out = unit[2]
+    try:
+        inputs = {path: file_fingerprint(path)["hash"] for path in unit_inputs(unit)}
+    except OSError:
+        return False
+    workbooks = {}
+    for workbook, sheet in unit_sheets(unit, reduction):
+        entry = manifest.get(f"{workbook}/{sheet}")
+        if entry is None or entry["inputs"] != inputs or entry["code"] != code:
+            return False
+        if entry.get("method") != reduced_method(workbook, sheet, reduction):
+            return False
+        if entry.get("dtype") != unit_dtype(unit, dtype):
+            return False
+        if entry.get("skipped"):
+            continue
+        if workbook not in workbooks:
+            path = os.path.join(dir_out, workbook)
+            if not os.path.exists(path):
+                return False
+            book = load_workbook(path, read_only=True)
+            workbooks[workbook] = set(book.sheetnames)
+            book.close()
+        if sheet not in workbooks[workbook]:
+            return False
+    return True
+# ============================================================================
+def record_unit(manifest, unit, outputs, code, reduction=None, dtype="float64", skipped=(), stored=False):
+    # skipped: sheet labels the unit left out for lack of input data; they are
+    # recorded as skipped so that the unit stays fresh until its inputs change.
+    # stored marks the profile sheets that were also added to the store.
+    run_mode, dir_in, dir_out, CY, years, workers, scenarios = unit
+    try:
+        inputs = {path: file_fingerprint(path)["hash"] for path in unit_inputs(unit)}
+    except OSError:
+        return
+    for workbook, sheet in unit_sheets(unit, reduction):
+        if sheet in outputs.get(workbook, {}):
+            manifest[f"{workbook}/{sheet}"] = {
+                "unit": f"{run_mode} {' '.join(map(str, years))} {CY}",
+                "inputs": inputs,
+                "code": code,
+            }
+            method = reduced_method(workbook, sheet, reduction)
+            if method is not None:
+                manifest[f"{workbook}/{sheet}"]["method"] = method
+            if unit_dtype(unit, dtype) is not None:
+                manifest[f"{workbook}/{sheet}"]["dtype"] = dtype
+            if stored and workbook == "tyndp_demand_profiles.xlsx":
+                manifest[f"{workbook}/{sheet}"]["stored"] = True
+    for workbook, sheet in unit_sheets(unit, reduction, labels=skipped) if skipped else []:
+        manifest[f"{workbook}/{sheet}"] = {
+            "unit": f"{run_mode} {' '.join(map(str, years))} {CY}",
+            "inputs": inputs,
+            "code": code,
+            "skipped": True,
+        }
+# ============================================================================
+def _run_job(job, stats=None, chunk_cols=None, dtype="float64", all_nodes=False, reduction=None, nested=False):
+    # one independent job: a (101, CY, year) unit, or all TYNDP 2022 units,
+    # whose climate years and scenarios are extracted in one pass over the
+    # results workbook. Runs in a worker process and returns
+    # [(dir_out, sheets, skipped labels)] per unit instead of writing, so the
+    # parent merges all writes; skipped are the sheet labels left out for lack
+    # of input data.
+    # stats (None or the memory flag of enable_stats) starts a fresh run report
+    # in a worker; its records are returned to the parent. chunk_cols and dtype
+    # select the low-memory read of the hourly TYNDP 2024 data, all_nodes the
+    # pan-European tables, reduction the reduced profiles (see reduce_outputs).
+    # nested is set when the job runs on the pool of run_tyndp: it then reads
+    # without prefetch or profile workers, so that the run keeps to `workers`
+    # processes.
+    global PREFETCH
+    if nested:
+        PREFETCH = 1
+    local = stats is not None
+    if local:
+        enable_stats(memory=stats)
+    results = []
+    run_mode, dir_in, dir_out, CY, years, workers, scenarios = job[0]
+    if run_mode == 101:
+        for unit in job:
+            outputs = make_tyndp24(
+                dir_in, unit[2], unit[3], years=unit[4], write=False, chunk_cols=chunk_cols, dtype=dtype,
+                all_nodes=all_nodes,
+            )
+            results.append((unit[2], outputs, []))
+    elif run_mode == 102:
+        tables = tyndp22_tables_many(
+            dir_in, [unit[3] for unit in job], years, scenarios, workers=1 if nested else workers,
+            all_nodes=all_nodes,
+        )
+        for unit in job:
+            outputs = {}
+            skipped = [
+                tyndp22_label(code, year) for code in scenarios if tables[(code, unit[3])] is not None
+                for year in years if year not in tables[(code, unit[3])]["generation"]
+            ]
+            for code in scenarios:
+                if tables[(code, unit[3])] is not None:
+                    for workbook, sheets in tyndp22_outputs(tables[(code, unit[3])], unit[3], code).items():
+                        for sheet_name, (df, idx) in sheets.items():
+                            add_sheet(outputs, workbook, sheet_name, df, idx)
+            results.append((unit[2], outputs, skipped))
+    for _, outputs, _ in results:
+        if reduction and outputs:
+            reduce_outputs(outputs, reduction, os.path.join(dir_in, CACHE_DIRNAME))
+    return results, collect_stats() if local else []
+# ============================================================================
+def write_report(path, records, **run):
+    # stage records plus totals per (vintage, CY, year, step)
+    summary = {}
+    for r in records:
+        key = " ".join(
+            " ".join(map(str, v)) if isinstance(v, list) else str(v)
+            for v in (r["vintage"], r["CY"], r["year"], r["step"]) if v is not None
+        )
+        total = summary.setdefault(key, {"wall_s": 0.0, "cpu_s": 0.0, "rows": 0, "cols": 0, "bytes": 0})
+        for field in total:
+            total[field] += r.get(field, 0)
+    _write_json_atomic(path, {"run": run, "summary": summary, "stages": records})
+
+# ============================================================================
+def unstored_sheets(unit, manifest, store_keys):
+    # profile sheets of a unit that are not in the store (store_keys: its
+    # entries) or were rebuilt without --store since they were added to it
+    sheets = []
+    for workbook, sheet in unit_sheets(unit):
+        entry = manifest.get(f"{workbook}/{sheet}", {})
+        match = PROFILE_SHEET.match(sheet)
+        if workbook != "tyndp_demand_profiles.xlsx" or match is None or entry.get("skipped"):
+            continue
+        code, year, CY = match.groups()
+        if not entry.get("stored") or (SCENARIO_VINTAGE[code], code[:2], CY, int(year)) not in store_keys:
+            sheets.append(sheet)
+    return sheets
+# ============================================================================
+def fill_store(unit, manifest):
+    # adds the profile sheets of an up-to-date unit to the store, read back
+    # from its workbook; returns the number of sheets added
+    path = os.path.join(os.path.dirname(unit[2]), STORE_NAME)
+    sheets = unstored_sheets(unit, manifest, set(profile_store_keys(path)) if os.path.exists(path) else set())
+    if not sheets:
+        return 0
+    inpath = os.path.join(unit[2], "tyndp_demand_profiles.xlsx")
+    profiles = {sheet: (pd.read_excel(inpath, sheet_name=sheet), False) for sheet in sheets}
+    store_profiles(path, {"tyndp_demand_profiles.xlsx": profiles})
+    for sheet in sheets:
+        manifest[f"tyndp_demand_profiles.xlsx/{sheet}"]["stored"] = True
+    return len(sheets)
+# ============================================================================
+def _write_dir(dir_out, outputs, store):
+    write_outputs(dir_out, outputs)
+    if store:
+        store_profiles(os.path.join(os.path.dirname(dir_out), STORE_NAME), outputs)
+# ============================================================================
+def output_dir(top_dir, CY, all_nodes=False):
+    # output folder of a CY; the all-nodes tables go to TYNDP_out/all_nodes
+    return os.path.abspath(os.path.join(top_dir, "TYNDP_out", "all_nodes" if all_nodes else "", CY))
+# ============================================================================
+def run_tyndp(top_dir, CYs, run_modes, years=(2035, 2050), workers=1, force=False, report=None,
+              chunk_cols=None, dtype="float64", all_nodes=False, store=False, reduction=None, scenarios=("GA",)):
+    # report: None, or the memory flag of enable_stats to write REPORT_NAME
+    # into TYNDP_out. all_nodes writes to TYNDP_out/all_nodes/{CY}. store adds
+    # the profiles to TYNDP_out/STORE_NAME, those of up-to-date units from
+    # their sheets if the store does not have them yet. reduction adds
+    # the reduced profiles of reduce_outputs to REDUCED_WORKBOOK. scenarios are
+    # the TYNDP 2022 scenario codes, see tyndp22_tables_many.
+    start = time.perf_counter(), time.process_time()
+    if report is not None:
+        enable_stats(memory=report)
+    dir_in = os.path.abspath(os.path.join(top_dir, "TYNDP_in/"))
+    units = []
+    for CY in CYs:
+        dir_out = output_dir(top_dir, CY, all_nodes)
+        os.makedirs(dir_out, exist_ok=True)
+        for run_mode in run_modes:
+            if run_mode == 101:   # TYNDP 2024
+                units += [(101, dir_in, dir_out, CY, [f"DE{year}"], 1, ("DE",)) for year in years]
+            elif run_mode == 102: # TYNDP 2022
+                units.append((102, dir_in, dir_out, CY, list(years), workers, tuple(scenarios)))
+    # skip units whose sheets are up to date with their inputs and the code;
+    # dtype only applies to the chunked read
+    code = code_fingerprint()
+    hourly_dtype = dtype if chunk_cols is not None else "float64"
+    manifests = {dir_out: load_manifest(dir_out) for dir_out in {unit[2] for unit in units}}
+    filled = set()
+    if not force:
+        fresh = [unit for unit in units if unit_is_fresh(unit, manifests[unit[2]], code, reduction, hourly_dtype)]
+        for unit in fresh:
+            print(f"Up to date : {unit[0]} {' '.join(map(str, unit[4]))} {unit[3]}")
+            # the store gets the profiles of up-to-date units from their sheets
+            if store and fill_store(unit, manifests[unit[2]]):
+                print(f"Added to {STORE_NAME} : {unit[0]} {' '.join(map(str, unit[4]))} {unit[3]}")
+                filled.add(unit[2])
+        units = [unit for unit in units if unit not in fresh]
+    # the TYNDP 2022 units of all CYs form one job that reads the results
+    # workbook once; outputs of a CY folder are written by a background thread
+    # as soon as its last unit is done, while the next jobs still run
+    jobs = [[unit] for unit in units if unit[0] == 101]
+    if any(unit[0] == 102 for unit in units):
+        jobs.append([unit for unit in units if unit[0] == 102])
+    remaining = collections.Counter(unit[2] for unit in units)
+    merged = {}
+    writes = []
+    with contextlib.ExitStack() as stack:
+        if workers > 1 and len(jobs) > 1:
+            pool = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+            results = pool.map(
+                _run_job, jobs, [report] * len(jobs), [chunk_cols] * len(jobs), [dtype] * len(jobs),
+                [all_nodes] * len(jobs), [reduction] * len(jobs), [True] * len(jobs),
+            )
+        else:
+            results = (
+                _run_job(job, chunk_cols=chunk_cols, dtype=dtype, all_nodes=all_nodes, reduction=reduction)
+                for job in jobs
+            )
+        writer = stack.enter_context(ThreadPoolExecutor(max_workers=1))
+        # merge in job order; within a CY folder the TYNDP 2024 sheets come
+        # first, as in a serial run
+        for job, (job_results, records) in zip(jobs, results):
+            if RUN_STATS is not None:
+                RUN_STATS.extend(records)
+            for unit, (dir_out, outputs, skipped) in zip(job, job_results):
+                for workbook, sheets in outputs.items():
+                    for sheet_name, (df, idx) in sheets.items():
+                        add_sheet(merged.setdefault(dir_out, {}), workbook, sheet_name, df, idx)
+                record_unit(manifests[dir_out], unit, outputs, code, reduction, hourly_dtype, skipped, store)
+                remaining[dir_out] -= 1
+                if not remaining[dir_out] and dir_out in merged:
+                    writes.append(writer.submit(_write_dir, dir_out, merged[dir_out], store))
+        for write in writes:
+            write.result()
+    for dir_out in set(merged) | filled:
+        _write_json_atomic(os.path.join(dir_out, MANIFEST_NAME), manifests[dir_out])
+    if 103 in run_modes:  # Correct TYNDP 2024 profiles
+        for CY in CYs:
+            mod_tyndp24(output_dir(top_dir, CY, all_nodes), CY)
+    if report is not None:
+        write_report(
+            os.path.abspath(os.path.join(top_dir, "TYNDP_out", REPORT_NAME)),
+            collect_stats(),
+            date=time.strftime("%Y-%m-%dT%H:%M:%S"),
+            CYs=list(CYs),
+            modes=list(run_modes),
+            years=list(years),
+            workers=workers,
+            wall_s=time.perf_counter() - start[0],
+            cpu_s=time.process_time() - start[1],
+            peak_rss_mb=_peak_rss_mb(),
+        )
+    return merged
+
+# ============================================================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Process TYNDP 2022 and 2024 data.")
+    parser.add_argument("--cy", nargs="+", default=["CY1995"],
+                        help="climate years, e.g. CY1995 CY2008")
+    parser.add_argument("--years", nargs="+", type=int, default=[2035, 2050],
+                        help="target years; TYNDP 2022 years between 2030 and 2050 are interpolated")
+    parser.add_argument("--modes", nargs="+", type=int, default=[103],
+                        help="101 : TYNDP24 , 102 : TYNDP22 , 103 : Correct Profile TYNDP24")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes")
+    parser.add_argument("--force", action="store_true",
+                        help="rebuild all sheets, also those the manifest reports up to date")
+    parser.add_argument("--report", action="store_true",
+                        help=f"write per-stage timings to TYNDP_out/{REPORT_NAME}")
+    parser.add_argument("--report-memory", action="store_true",
+                        help="also trace Python allocations per stage (slower)")
+    parser.add_argument("--chunk-cols", type=int, default=None,
+                        help="low-memory mode: parse the hourly TYNDP24 data in chunks of this many columns")
+    parser.add_argument("--float32", action="store_true",
+                        help="parse the hourly chunks into float32 instead of float64 (with --chunk-cols)")
+    parser.add_argument("--all-nodes", action="store_true",
+                        help="all countries of the input files instead of AT, CH, DE, FR and IT (TYNDP_out/all_nodes)")
+    parser.add_argument("--scenarios", nargs="+", default=["GA"], choices=["GA", "NT", "DE22"],
+                        help="TYNDP 2022 scenarios: Global Ambition, National Trends, Distributed Energy")
+    parser.add_argument("--resolutions", nargs="+", type=int, default=[],
+                        help=f"also write the profiles summed over blocks of these hours, e.g. 2 3 6 24 168 ({REDUCED_WORKBOOK})")
+    parser.add_argument("--rep-days", type=int, default=None,
+                        help="also write this many weighted representative days of the profiles")
+    parser.add_argument("--rep-method", choices=["kmedoids", "kmeans"], default="kmedoids",
+                        help="clustering of the representative days")
+    parser.add_argument("--store", action="store_true",
+                        help=f"also add the hourly profiles to TYNDP_out/{STORE_NAME} (needs h5py)")
+    return parser.parse_args(argv)
+
+# ============================================================================
+def main(argv=None):
+    start_time = time.perf_counter()
+    args = parse_args(argv)
     # Directory
     top_dir = os.path.abspath(os.path.dirname(__file__))
-    # The input/output directory relative to the top directory
-    dir_in	= os.path.abspath(os.path.join(top_dir, "TYNDP_in/"))
-    dir_out	= os.path.abspath(os.path.join(top_dir, f"TYNDP_out/{CY}/"))
-    if not os.path.exists(dir_out):
-        os.makedirs(dir_out)
-    else:
-        pass
-
-    if (run_mode == 101): # TYNDP 2024
-        make_tyndp24(dir_in, dir_out, CY)
-    elif (run_mode == 102): # TYNDP 2022
-        make_tyndp22(dir_in, dir_out, CY)
-    elif (run_mode == 103): # Correct TYNDP 2024 profiles
-        mod_tyndp24(dir_out, CY)
-    else:
-        pass
+    report = args.report_memory if args.report or args.report_memory else None
+    run_tyndp(
+        top_dir, args.cy, args.modes, years=args.years, workers=args.workers, force=args.force, report=report,
+        chunk_cols=args.chunk_cols, dtype="float32" if args.float32 else "float64", all_nodes=args.all_nodes,
+        store=args.store,
+        scenarios=args.scenarios,
+        reduction={"resolutions": args.resolutions, "rep_days": args.rep_days, "method": args.rep_method}
+        if args.resolutions or args.rep_days else None,
+    )
 
     run_time = round(time.perf_counter() - start_time, 3)
     msg_str = f"Run time : {run_time:.3f} second"
     print(msg_str)
 # ============================================================================
 # Normal run modes:   101 : TYNDP24 , 102 : TYNDP22 , 103 : Correct Profile TYNDP24
-if __name__ == "__main__" : main(103)
+# e.g. python tyndp_processing.py --cy CY1995 CY2008 --modes 101 102 103 --workers 4
+if __name__ == "__main__" : main()
 # ============================================================================